@@ -0,0 +1,61 @@
+# UI-thread time per displayed frame: the old show_image path (resize, BGR->RGB, QImage, QPixmap,
+# setPixmap) against FrameView, on synthetic 1080p and 4K frames shown in a 960x540 panel.
+# Run from the project root:  python -m benchmarks.display_bench [--iters 200]
+# (uses the offscreen Qt platform unless QT_QPA_PLATFORM is set)
+import os
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtWidgets import QApplication, QLabel
+from ui.FrameView import FrameView
+import numpy as np
+import argparse
+import time
+import cv2
+
+
+def show_image_baseline(img_src, label):
+    ih, iw, _ = img_src.shape
+    w = label.geometry().width()
+    h = label.geometry().height()
+    if iw / w > ih / h:
+        nw, nh = w, int(w / iw * ih)
+    else:
+        nw, nh = int(h / ih * iw), h
+    frame = cv2.cvtColor(cv2.resize(img_src, (nw, nh)), cv2.COLOR_BGR2RGB)
+    img = QImage(frame.data, frame.shape[1], frame.shape[0], frame.shape[2] * frame.shape[1], QImage.Format_RGB888)
+    label.setPixmap(QPixmap.fromImage(img))
+
+
+def bench(show, frames, widget, iters):
+    for i in range(5):     # warmup
+        show(frames[i % len(frames)])
+        widget.repaint()
+    t = time.perf_counter()
+    for i in range(iters):
+        show(frames[i % len(frames)])
+        widget.repaint()    # paint synchronously so painting is part of the measurement
+    return (time.perf_counter() - t) / iters * 1E3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iters', type=int, default=200)
+    parser.add_argument('--panel', type=int, nargs=2, default=(960, 540), metavar=('W', 'H'))
+    opt = parser.parse_args()
+
+    app = QApplication([])
+    label, view = QLabel(), FrameView()
+    for w in (label, view):
+        w.resize(*opt.panel)
+        w.show()
+    app.processEvents()
+    for name, (h, w) in (('1080p', (1080, 1920)), ('4K', (2160, 3840))):
+        frames = [np.random.randint(0, 255, (h, w, 3), dtype=np.uint8) for _ in range(4)]
+        t0 = bench(lambda im: show_image_baseline(im, label), frames, label, opt.iters)
+        t1 = bench(view.setFrame, frames, view, opt.iters)
+        print(f'{name:>5} {w}x{h} -> {opt.panel[0]}x{opt.panel[1]} panel:  show_image {t0:6.2f} ms   '
+              f'FrameView {t1:6.2f} ms   speedup {t0 / t1:4.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# INT8 vs FP32 check on a local image folder: runs the ONNX Runtime FP32 export and its INT8
+# quantization (calibrated on the same folder) and reports how many FP32 detections INT8 reproduces,
+# how many it adds, the box/confidence drift and the latency of both.
+# Run from the project root:  python -m benchmarks.int8_accuracy --weights models/yolov8n.pt --images ./images
+from ultralytics.yolo.utils import ops
+from ultralytics.yolo.utils.metrics import box_iou
+from ultralytics.yolo.data.utils import IMG_FORMATS
+from utils.backends import calibration_frames, load_backend
+from utils.preprocess import FusedPreprocessor
+from pathlib import Path
+import argparse
+import time
+import torch
+import cv2
+
+
+def detect(model, x, conf, iou):
+    t = time.perf_counter()
+    preds = model(x)
+    dt = time.perf_counter() - t
+    return ops.non_max_suppression(preds, conf, iou, max_det=300)[0], dt
+
+
+# Greedy one-to-one matching of test boxes to reference boxes of the same class, highest confidence first
+def match(ref, test, iou_thres=0.5):
+    if len(ref) == 0 or len(test) == 0:
+        return []
+    iou = box_iou(test[:, :4], ref[:, :4])
+    iou[test[:, 5:6] != ref[:, 5]] = 0
+    pairs, used = [], set()
+    for i in test[:, 4].argsort(descending=True).tolist():
+        j = int(iou[i].argmax())
+        if iou[i, j] >= iou_thres and j not in used:
+            used.add(j)
+            pairs.append((i, j, float(iou[i, j])))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weights', default='models/yolov8n.pt')
+    parser.add_argument('--images', required=True)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.45)
+    parser.add_argument('--calib', type=int, default=32, help='calibration images')
+    opt = parser.parse_args()
+
+    files = sorted(f for f in Path(opt.images).iterdir() if f.suffix[1:].lower() in IMG_FORMATS)
+    assert files, f'no images in {opt.images}'
+    fp32 = load_backend(opt.weights, 'ONNX Runtime', imgsz=opt.imgsz, verbose=False)
+    int8 = load_backend(opt.weights, precision='INT8 (CPU)', imgsz=opt.imgsz, verbose=False,
+                        calibration=lambda: calibration_frames(opt.images, imgsz=opt.imgsz, n=opt.calib))
+    preprocessor = FusedPreprocessor(opt.imgsz, auto=False)
+
+    n_ref = n_test = n_match = 0
+    ious, dconf, t_ref, t_test = [], [], 0.0, 0.0
+    for f in files:
+        x = preprocessor(cv2.imread(str(f)), 'cpu')
+        ref, dt = detect(fp32, x, opt.conf, opt.iou)
+        t_ref += dt
+        test, dt = detect(int8, x, opt.conf, opt.iou)
+        t_test += dt
+        pairs = match(ref, test)
+        n_ref, n_test, n_match = n_ref + len(ref), n_test + len(test), n_match + len(pairs)
+        ious += [p[2] for p in pairs]
+        dconf += [abs(float(test[i, 4] - ref[j, 4])) for i, j, _ in pairs]
+
+    print(f'{len(files)} images, conf {opt.conf}, iou {opt.iou}')
+    print(f'FP32 detections {n_ref}   INT8 detections {n_test}   matched {n_match}')
+    print(f'recall vs FP32 {n_match / max(n_ref, 1):.3f}   precision vs FP32 {n_match / max(n_test, 1):.3f}')
+    print(f'mean matched IoU {sum(ious) / max(len(ious), 1):.3f}   mean |conf diff| {sum(dconf) / max(len(dconf), 1):.4f}')
+    print(f'latency FP32 {t_ref / len(files) * 1E3:.1f} ms   INT8 {t_test / len(files) * 1E3:.1f} ms   '
+          f'speedup {t_ref / max(t_test, 1E-9):.2f}x')
+
+
+if __name__ == '__main__':
+    main()
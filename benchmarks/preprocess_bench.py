@@ -0,0 +1,58 @@
+# Preprocessing microbenchmark: ultralytics LetterBox + old YoloPredictor.preprocess
+# against FusedPreprocessor, on synthetic 720p and 4K frames.
+# Run from the project root:  python -m benchmarks.preprocess_bench [--device cpu] [--half]
+from ultralytics.yolo.data.augment import LetterBox
+from utils.preprocess import FusedPreprocessor
+import numpy as np
+import argparse
+import time
+import torch
+
+
+def baseline(im0, letterbox, device, half):
+    im = letterbox(image=im0)
+    im = np.ascontiguousarray(im.transpose((2, 0, 1))[::-1])  # HWC to CHW, BGR to RGB
+    im = torch.from_numpy(im).to(device)
+    im = im.half() if half else im.float()
+    im /= 255
+    return im[None]
+
+
+def bench(fn, iters, device):
+    for _ in range(5):     # warmup
+        fn()
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    t = time.perf_counter()
+    for _ in range(iters):
+        fn()
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+    return (time.perf_counter() - t) / iters * 1E3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--half', action='store_true')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--iters', type=int, default=100)
+    opt = parser.parse_args()
+
+    device = torch.device(opt.device)
+    letterbox = LetterBox(opt.imgsz, auto=True, stride=32)
+    fused = FusedPreprocessor(opt.imgsz, stride=32, auto=True)
+    for name, (h, w) in (('720p', (720, 1280)), ('4K', (2160, 3840))):
+        im0 = np.random.randint(0, 255, (h, w, 3), dtype=np.uint8)
+        a = baseline(im0, letterbox, device, opt.half)
+        b = fused(im0, device, opt.half)
+        assert a.shape == b.shape, (a.shape, b.shape)
+        err = (a.float() - b.float()).abs().max().item()
+        t0 = bench(lambda: baseline(im0, letterbox, device, opt.half), opt.iters, device)
+        t1 = bench(lambda: fused(im0, device, opt.half), opt.iters, device)
+        print(f'{name:>5} {w}x{h} -> {tuple(b.shape[2:])}:  baseline {t0:6.2f} ms   fused {t1:6.2f} ms   '
+              f'speedup {t0 / t1:4.2f}x   max abs diff {err:.1e}')
+
+
+if __name__ == '__main__':
+    main()
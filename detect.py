@@ -0,0 +1,109 @@
+# Headless detection: the same YoloPredictor pipeline as the GUI, driven from the command line
+# without a QApplication, for files, folders, videos and streams.
+#   python detect.py --source ./images --model models/yolov8n.pt --save txt,json --batch 8
+from ultralytics.yolo.utils import LOGGER
+from PySide6.QtCore import Qt
+from utils.predictor import YoloPredictor
+from utils.backends import BACKENDS, PRECISIONS
+from utils.chunks import detect_chunked
+from pathlib import Path
+import argparse
+import signal
+import time
+import torch
+import sys
+
+FORMATS = ('media', 'txt', 'json', 'crop')      # annotated images/videos, YOLO labels, detections.jsonl, crops
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='YOLOv8 detection without the GUI')
+    parser.add_argument('--source', required=True, help='file, folder, glob, video, camera index or rtsp/http url')
+    parser.add_argument('--model', default='models/yolov8n.pt')
+    parser.add_argument('--backend', default=BACKENDS[0], choices=BACKENDS)
+    parser.add_argument('--precision', default=PRECISIONS[0], choices=PRECISIONS)
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or cpu')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.45)
+    parser.add_argument('--batch', type=int, default=1, help='frames per model call (files and folders)')
+    parser.add_argument('--fps', type=float, default=0, help='cap detection at this frame rate (0: unlimited)')
+    parser.add_argument('--threads', type=int, default=0, help='torch/ONNX Runtime CPU threads (0: default)')
+    parser.add_argument('--save', default='media', help=f'comma-separated output formats: {",".join(FORMATS)} or none')
+    parser.add_argument('--project', default='', help='output root, default runs/detect')
+    parser.add_argument('--all-frames', action='store_true', help='streams: detect every frame instead of the newest')
+    parser.add_argument('--chunks', type=int, default=0,
+                        help='video file: split into keyframe-aligned chunks detected by this many processes '
+                             '(--threads per process), saves media, txt and json')
+    return parser.parse_args()
+
+
+def main():
+    opt = parse_args()
+    formats = set() if opt.save == 'none' else set(opt.save.split(','))
+    assert formats <= set(FORMATS), f'unknown output format in {opt.save}, expected {FORMATS}'
+    if opt.threads:
+        torch.set_num_threads(opt.threads)
+
+    overrides = {'imgsz': opt.imgsz, 'device': opt.device, 'save_crop': 'crop' in formats}
+    if opt.project:
+        overrides['project'] = opt.project
+    predictor = YoloPredictor(overrides=overrides)
+    if opt.chunks:
+        assert Path(opt.source).is_file(), '--chunks needs a video file'
+        assert formats <= {'media', 'txt', 'json'}, '--chunks saves media, txt and json only, not crop'
+        assert opt.batch == 1 and not opt.fps, '--chunks does not support --batch or --fps'
+        t = time.perf_counter()
+        frames = detect_chunked(opt.source, predictor.save_dir, opt.model, workers=opt.chunks, threads=opt.threads,
+                                backend=opt.backend, precision=opt.precision, device=opt.device, imgsz=opt.imgsz,
+                                conf=opt.conf, iou=opt.iou, save_video='media' in formats,
+                                save_json='json' in formats, save_txt='txt' in formats)
+        elapsed = time.perf_counter() - t
+        LOGGER.info(f'{frames} frames in {elapsed:.1f}s, {frames / elapsed:.1f} FPS over {opt.chunks} processes')
+        if formats:
+            LOGGER.info(f'Results saved to {predictor.save_dir}')
+        return 0
+    predictor.new_model_name = opt.model
+    predictor.backend = opt.backend
+    predictor.precision = opt.precision
+    predictor.source = opt.source
+    predictor.conf_thres = opt.conf
+    predictor.iou_thres = opt.iou
+    predictor.batch_size = max(opt.batch, 1)
+    predictor.threads = opt.threads
+    predictor.speed_thres = 0                   # no frame budget, as fast as possible
+    predictor.target_fps = opt.fps              # unless a frame rate cap is given
+    predictor.latest_frame = not opt.all_frames
+    predictor.write_policy = 'block'            # never drop output frames
+    predictor.save_res = 'media' in formats
+    predictor.save_txt = 'txt' in formats
+    predictor.save_json = 'json' in formats
+
+    # status is emitted on this thread, print it directly (there is no event loop to queue to)
+    last = [None]
+
+    def status(msg):
+        if msg != last[0]:
+            LOGGER.info(msg)
+            last[0] = msg
+    predictor.yolo2main_status_msg.connect(status, Qt.DirectConnection)
+    signal.signal(signal.SIGINT, lambda *_: predictor.control.send('stop'))    # Ctrl+C ends streams cleanly
+
+    t = time.perf_counter()
+    predictor.run()
+    elapsed = time.perf_counter() - t
+
+    if predictor.error is not None:
+        return 1
+    seen = max(predictor.seen, 1)
+    pre, inf, post = (dt.t / seen * 1E3 for dt in predictor.dt)
+    LOGGER.info(f'{predictor.seen} frames in {elapsed:.1f}s, {predictor.seen / elapsed:.1f} FPS end to end '
+                f'(startup included), per frame: {pre:.1f}ms preprocess, {inf:.1f}ms inference, '
+                f'{post:.1f}ms postprocess')
+    if formats:
+        LOGGER.info(f'Results saved to {predictor.save_dir}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
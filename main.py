@@ -1,305 +1,29 @@
-from ultralytics.yolo.engine.predictor import BasePredictor
-from ultralytics.yolo.engine.results import Results
-from ultralytics.yolo.utils import DEFAULT_CFG, LOGGER, SETTINGS, callbacks, ops
-from ultralytics.yolo.utils.plotting import Annotator, colors, save_one_box
-from ultralytics.yolo.utils.torch_utils import smart_inference_mode
-from ultralytics.yolo.utils.files import increment_path
-from ultralytics.yolo.utils.checks import check_imshow
-from ultralytics.yolo.cfg import get_cfg
-from PySide6.QtWidgets import QApplication, QMainWindow, QFileDialog, QMenu
-from PySide6.QtGui import QImage, QPixmap, QColor
-from PySide6.QtCore import QTimer, QThread, Signal, QObject, QPoint, Qt
+from PySide6.QtWidgets import QApplication, QMainWindow, QFileDialog, QMenu, QComboBox, QCheckBox, QFrame, QLabel, QVBoxLayout
+from PySide6.QtGui import QColor, QCursor
+from PySide6.QtCore import QTimer, QThread, Signal, QPoint, QSize, Qt
 from ui.CustomMessageBox import MessageBox
 from ui.home import Ui_MainWindow
+from ui.FrameView import FrameView
 from UIFunctions import *
-from collections import defaultdict
-from pathlib import Path
 from utils.capnums import Camera
 from utils.rtsp_win import Window
-import numpy as np
+from utils.predictor import YoloPredictor
+from utils.backends import BACKENDS, PRECISIONS
+from utils.writers import ResultWriter
 import time
 import json
-import torch
 import sys
-import cv2
 import os
 
 
-class YoloPredictor(BasePredictor, QObject):
-    yolo2main_pre_img = Signal(np.ndarray)   # raw image signal
-    yolo2main_res_img = Signal(np.ndarray)   # test result signal
-    yolo2main_status_msg = Signal(str)       # Detecting/pausing/stopping/testing complete/error reporting signal
-    yolo2main_fps = Signal(str)              # fps
-    yolo2main_labels = Signal(dict)          # Detected target results (number of each category)
-    yolo2main_progress = Signal(int)         # Completeness
-    yolo2main_class_num = Signal(int)        # Number of categories detected
-    yolo2main_target_num = Signal(int)       # Targets detected
-
-    def __init__(self, cfg=DEFAULT_CFG, overrides=None): 
-        super(YoloPredictor, self).__init__() 
-        QObject.__init__(self)
-
-        self.args = get_cfg(cfg, overrides)
-        project = self.args.project or Path(SETTINGS['runs_dir']) / self.args.task
-        name = f'{self.args.mode}'
-        self.save_dir = increment_path(Path(project) / name, exist_ok=self.args.exist_ok)
-        self.done_warmup = False
-        if self.args.show:
-            self.args.show = check_imshow(warn=True)
-
-        # GUI args
-        self.used_model_name = None      # The detection model name to use
-        self.new_model_name = None       # Models that change in real time
-        self.source = ''                 # input source
-        self.stop_dtc = False            # Termination detection
-        self.continue_dtc = True         # pause   
-        self.save_res = False            # Save test results
-        self.save_txt = False            # save label(txt) file
-        self.iou_thres = 0.45            # iou
-        self.conf_thres = 0.25           # conf
-        self.speed_thres = 10            # delay, ms
-        self.labels_dict = {}            # return a dictionary of results
-        self.progress_value = 0          # progress bar
-    
-
-        # Usable if setup is done
-        self.model = None
-        self.data = self.args.data  # data_dict
-        self.imgsz = None
-        self.device = None
-        self.dataset = None
-        self.vid_path, self.vid_writer = None, None
-        self.annotator = None
-        self.data_path = None
-        self.source_type = None
-        self.batch = None
-        self.callbacks = defaultdict(list, callbacks.default_callbacks)  # add callbacks
-        callbacks.add_integration_callbacks(self)
-
-    # main for detect
-    @smart_inference_mode()
-    def run(self):
-        try:
-            if self.args.verbose:
-                LOGGER.info('')
-
-            # set model    
-            self.yolo2main_status_msg.emit('Loding Model...')
-            if not self.model:
-                self.setup_model(self.new_model_name)
-                self.used_model_name = self.new_model_name
-
-            # set source
-            self.setup_source(self.source if self.source is not None else self.args.source)
-
-            # Check save path/label
-            if self.save_res or self.save_txt:
-                (self.save_dir / 'labels' if self.save_txt else self.save_dir).mkdir(parents=True, exist_ok=True)
-
-            # warmup model
-            if not self.done_warmup:
-                self.model.warmup(imgsz=(1 if self.model.pt or self.model.triton else self.dataset.bs, 3, *self.imgsz))
-                self.done_warmup = True
-
-            self.seen, self.windows, self.dt, self.batch = 0, [], (ops.Profile(), ops.Profile(), ops.Profile()), None
-
-            # start detection
-            # for batch in self.dataset:
-
-
-            count = 0                       # run location frame
-            start_time = time.time()        # used to calculate the frame rate
-            batch = iter(self.dataset)
-            while True:
-                # Termination detection
-                if self.stop_dtc:
-                    if isinstance(self.vid_writer[-1], cv2.VideoWriter):
-                        self.vid_writer[-1].release()  # release final video writer
-                    self.yolo2main_status_msg.emit('Detection terminated!')
-                    break
-                
-                # Change the model midway
-                if self.used_model_name != self.new_model_name:  
-                    # self.yolo2main_status_msg.emit('Change Model...')
-                    self.setup_model(self.new_model_name)
-                    self.used_model_name = self.new_model_name
-                
-                # pause switch
-                if self.continue_dtc:
-                    # time.sleep(0.001)
-                    self.yolo2main_status_msg.emit('Detecting...')
-                    batch = next(self.dataset)  # next data
-
-                    self.batch = batch
-                    path, im, im0s, vid_cap, s = batch
-                    visualize = increment_path(self.save_dir / Path(path).stem, mkdir=True) if self.args.visualize else False
-
-                    # Calculation completion and frame rate (to be optimized)
-                    count += 1              # frame count +1
-                    if vid_cap:
-                        all_count = vid_cap.get(cv2.CAP_PROP_FRAME_COUNT)   # total frames
-                    else:
-                        all_count = 1
-                    self.progress_value = int(count/all_count*1000)         # progress bar(0~1000)
-                    if count % 5 == 0 and count >= 5:                     # Calculate the frame rate every 5 frames
-                        self.yolo2main_fps.emit(str(int(5/(time.time()-start_time))))
-                        start_time = time.time()
-                    
-                    # preprocess 
-                    with self.dt[0]:
-                        im = self.preprocess(im)
-                        if len(im.shape) == 3:
-                            im = im[None]  # expand for batch dim
-                    # inference 
-                    with self.dt[1]:
-                        preds = self.model(im, augment=self.args.augment, visualize=visualize)
-                    # postprocess 
-                    with self.dt[2]:
-                        self.results = self.postprocess(preds, im, im0s)
-
-                    # visualize, save, write results  
-                    n = len(im)     # To be improved: support multiple img
-                    for i in range(n):
-                        self.results[i].speed = {
-                            'preprocess': self.dt[0].dt * 1E3 / n,
-                            'inference': self.dt[1].dt * 1E3 / n,
-                            'postprocess': self.dt[2].dt * 1E3 / n}
-                        p, im0 = (path[i], im0s[i].copy()) if self.source_type.webcam or self.source_type.from_img \
-                            else (path, im0s.copy())
-                        p = Path(p)     # the source dir
-
-                        # s:::   video 1/1 (6/6557) 'path':
-                        # must, to get boxs\labels
-                        label_str = self.write_results(i, self.results, (p, im, im0))   # labels   /// original :s += 
-                        
-                        # labels and nums dict
-                        class_nums = 0
-                        target_nums = 0
-                        self.labels_dict = {}
-                        if 'no detections' in label_str:
-                            pass
-                        else:
-                            for ii in label_str.split(',')[:-1]:
-                                nums, label_name = ii.split('~')
-                                self.labels_dict[label_name] = int(nums)
-                                target_nums += int(nums)
-                                class_nums += 1
-
-                        # save img or video result
-                        if self.save_res:
-                            self.save_preds(vid_cap, i, str(self.save_dir / p.name))
-
-                        # Send test results
-                        self.yolo2main_res_img.emit(im0) # after detection
-                        self.yolo2main_pre_img.emit(im0s if isinstance(im0s, np.ndarray) else im0s[0])   # Before testing
-                        # self.yolo2main_labels.emit(self.labels_dict)        # webcam need to change the def write_results
-                        self.yolo2main_class_num.emit(class_nums)
-                        self.yolo2main_target_num.emit(target_nums)
-
-                        if self.speed_thres != 0:
-                            time.sleep(self.speed_thres/1000)   # delay , ms
-
-                    self.yolo2main_progress.emit(self.progress_value)   # progress bar
-
-                # Detection completed
-                if count + 1 >= all_count:
-                    if isinstance(self.vid_writer[-1], cv2.VideoWriter):
-                        self.vid_writer[-1].release()  # release final video writer
-                    self.yolo2main_status_msg.emit('Detection completed')
-                    break
-
-        except Exception as e:
-            pass
-            print(e)
-            self.yolo2main_status_msg.emit('%s' % e)
-
-
-    def get_annotator(self, img):
-        return Annotator(img, line_width=self.args.line_thickness, example=str(self.model.names))
-
-    def preprocess(self, img):
-        img = torch.from_numpy(img).to(self.model.device)
-        img = img.half() if self.model.fp16 else img.float()  # uint8 to fp16/32
-        img /= 255  # 0 - 255 to 0.0 - 1.0
-        return img
-
-    def postprocess(self, preds, img, orig_img):
-        ### important
-        preds = ops.non_max_suppression(preds,
-                                        self.conf_thres,
-                                        self.iou_thres,
-                                        agnostic=self.args.agnostic_nms,
-                                        max_det=self.args.max_det,
-                                        classes=self.args.classes)
-
-        results = []
-        for i, pred in enumerate(preds):
-            orig_img = orig_img[i] if isinstance(orig_img, list) else orig_img
-            shape = orig_img.shape
-            pred[:, :4] = ops.scale_boxes(img.shape[2:], pred[:, :4], shape).round()
-            path, _, _, _, _ = self.batch
-            img_path = path[i] if isinstance(path, list) else path
-            results.append(Results(orig_img=orig_img, path=img_path, names=self.model.names, boxes=pred))
-        # print(results)
-        return results
-
-    def write_results(self, idx, results, batch):
-        p, im, im0 = batch
-        log_string = ''
-        if len(im.shape) == 3:
-            im = im[None]  # expand for batch dim
-        self.seen += 1
-        imc = im0.copy() if self.args.save_crop else im0
-        if self.source_type.webcam or self.source_type.from_img:  # batch_size >= 1         # attention
-            log_string += f'{idx}: '
-            frame = self.dataset.count
-        else:
-            frame = getattr(self.dataset, 'frame', 0)
-        self.data_path = p
-        self.txt_path = str(self.save_dir / 'labels' / p.stem) + ('' if self.dataset.mode == 'image' else f'_{frame}')
-        # log_string += '%gx%g ' % im.shape[2:]         # !!! don't add img size~
-        self.annotator = self.get_annotator(im0)
-
-        det = results[idx].boxes  # TODO: make boxes inherit from tensors
-
-        if len(det) == 0:
-            return f'{log_string}(no detections), ' # if no, send this~~
-
-        for c in det.cls.unique():
-            n = (det.cls == c).sum()  # detections per class
-            log_string += f"{n}~{self.model.names[int(c)]},"   #   {'s' * (n > 1)}, "   # don't add 's'
-        # now log_string is the classes 👆
-
-
-        # write
-        for d in reversed(det):
-            cls, conf = d.cls.squeeze(), d.conf.squeeze()
-            if self.save_txt:  # Write to file
-                line = (cls, *(d.xywhn.view(-1).tolist()), conf) \
-                    if self.args.save_conf else (cls, *(d.xywhn.view(-1).tolist()))  # label format
-                with open(f'{self.txt_path}.txt', 'a') as f:
-                    f.write(('%g ' * len(line)).rstrip() % line + '\n')
-            if self.save_res or self.args.save_crop or self.args.show or True:  # Add bbox to image(must)
-                c = int(cls)  # integer class
-                name = f'id:{int(d.id.item())} {self.model.names[c]}' if d.id is not None else self.model.names[c]
-                label = None if self.args.hide_labels else (name if self.args.hide_conf else f'{name} {conf:.2f}')
-                self.annotator.box_label(d.xyxy.squeeze(), label, color=colors(c, True))
-            if self.args.save_crop:
-                save_one_box(d.xyxy,
-                             imc,
-                             file=self.save_dir / 'crops' / self.model.model.names[c] / f'{self.data_path.stem}.jpg',
-                             BGR=True)
-
-        return log_string
-        
-
-
 class MainWindow(QMainWindow, Ui_MainWindow):
     main2yolo_begin_sgl = Signal()  # The main window sends an execution signal to the yolo instance
     def __init__(self, parent=None):
         super(MainWindow, self).__init__(parent)
         # basic interface
         self.setupUi(self)
+        self.pre_video = FrameView.replace(self.pre_video)     # video panels paint BGR frames directly
+        self.res_video = FrameView.replace(self.res_video)
         self.setAttribute(Qt.WA_TranslucentBackground)  # rounded transparent
         self.setWindowFlags(Qt.FramelessWindowHint)  # Set window flag: hide window borders
         UIFuncitons.uiDefinitions(self)
@@ -317,6 +41,50 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.pt_list.sort(key=lambda x: os.path.getsize('./models/' + x))   # sort by file size
         self.model_box.clear()
         self.model_box.addItems(self.pt_list)
+        # inference backend, remembered per model
+        self.backend_box = QComboBox(self.Model_QF_2)
+        self.backend_box.setObjectName(u"backend_box")
+        self.backend_box.setMinimumSize(QSize(170, 20))
+        self.backend_box.setMaximumSize(QSize(170, 20))
+        self.backend_box.setStyleSheet(self.model_box.styleSheet())
+        self.backend_box.addItems(BACKENDS)
+        self.verticalLayout_21.addWidget(self.backend_box)
+        # precision: INT8 runs a quantized ONNX export on the CPU, whatever the backend
+        self.precision_box = QComboBox(self.Model_QF_2)
+        self.precision_box.setObjectName(u"precision_box")
+        self.precision_box.setMinimumSize(QSize(170, 20))
+        self.precision_box.setMaximumSize(QSize(170, 20))
+        self.precision_box.setStyleSheet(self.model_box.styleSheet())
+        self.precision_box.addItems(PRECISIONS)
+        self.verticalLayout_21.addWidget(self.precision_box)
+        self.Model_QF_2.setMinimumSize(QSize(190, 150))
+        self.Model_QF_2.setMaximumSize(QSize(190, 150))
+        # stop building display frames while the window is minimized/hidden, detection and saving go on
+        self.headless_button = QCheckBox(self.Save_QF)
+        self.headless_button.setObjectName(u"headless_button")
+        self.headless_button.setCursor(QCursor(Qt.PointingHandCursor))
+        self.headless_button.setStyleSheet(self.save_txt_button.styleSheet())
+        self.headless_button.setText('Headless when hidden')
+        self.verticalLayout_20.addWidget(self.headless_button)
+        self.Save_QF.setMinimumSize(QSize(190, 150))
+        self.Save_QF.setMaximumSize(QSize(190, 150))
+        # performance: rolling per-stage latency percentiles, queue depths and dropped frames
+        self.Perf_QF = QFrame(self.prm_page)
+        self.Perf_QF.setObjectName(u"Perf_QF")
+        self.Perf_QF.setMinimumSize(QSize(190, 0))
+        self.Perf_QF.setMaximumSize(QSize(190, 16777215))
+        self.Perf_QF.setStyleSheet(u"QFrame#Perf_QF{\nborder:2px solid rgba(255, 255, 255, 70);\nborder-radius:15px;\n}")
+        self.verticalLayout_perf = QVBoxLayout(self.Perf_QF)
+        self.verticalLayout_perf.setContentsMargins(9, 9, 9, 9)
+        self.perf_title = QLabel('Performance', self.Perf_QF)
+        self.perf_title.setStyleSheet(u"color: rgba(255, 255, 255, 199);\nfont: 700 13pt \"Nirmala UI\";\npadding-left: 20px;")
+        self.verticalLayout_perf.addWidget(self.perf_title)
+        self.perf_label = QLabel('--', self.Perf_QF)
+        self.perf_label.setStyleSheet(u"color: rgba(255, 255, 255, 199);\nfont: 8pt \"Consolas\";")
+        self.perf_label.setWordWrap(True)
+        self.verticalLayout_perf.addWidget(self.perf_label)
+        self.verticalLayout_22.insertWidget(self.verticalLayout_22.indexOf(self.Save_QF) + 1, self.Perf_QF)
+        self.model_backends = {}        # model file -> backend name
         self.Qtimer_ModelBox = QTimer(self)     # Timer: Monitor model file changes every 2 seconds
         self.Qtimer_ModelBox.timeout.connect(self.ModelBoxRefre)
         self.Qtimer_ModelBox.start(2000)
@@ -326,19 +94,25 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.select_model = self.model_box.currentText()                   # default model
         self.yolo_predict.new_model_name = "./models/%s" % self.select_model  
         self.yolo_thread = QThread()                                  # Create yolo thread
-        self.yolo_predict.yolo2main_pre_img.connect(lambda x: self.show_image(x, self.pre_video)) 
-        self.yolo_predict.yolo2main_res_img.connect(lambda x: self.show_image(x, self.res_video))
         self.yolo_predict.yolo2main_status_msg.connect(lambda x: self.show_status(x))             
-        self.yolo_predict.yolo2main_fps.connect(lambda x: self.fps_label.setText(x))              
         # self.yolo_predict.yolo2main_labels.connect(self.show_labels)                            
-        self.yolo_predict.yolo2main_class_num.connect(lambda x:self.Class_num.setText(str(x)))         
-        self.yolo_predict.yolo2main_target_num.connect(lambda x:self.Target_num.setText(str(x)))       
-        self.yolo_predict.yolo2main_progress.connect(lambda x: self.progress_bar.setValue(x))     
         self.main2yolo_begin_sgl.connect(self.yolo_predict.run)     
         self.yolo_predict.moveToThread(self.yolo_thread)              
+        self.Qtimer_Display = QTimer(self)      # Timer: show the newest detected frame, stale ones are skipped
+        self.Qtimer_Display.timeout.connect(self.show_frames)
+        self.Qtimer_Display.start(30)
+        self.telemetry_seq = None               # telemetry snapshot on screen
+        self.Qtimer_Telemetry = QTimer(self)    # Timer: fps/counts/progress/queue tooltip at 10 Hz
+        self.Qtimer_Telemetry.timeout.connect(self.show_telemetry)
+        self.Qtimer_Telemetry.start(100)
+        self.Qtimer_Perf = QTimer(self)         # Timer: performance panel at 2 Hz while the settings page is open
+        self.Qtimer_Perf.timeout.connect(self.show_performance)
+        self.Qtimer_Perf.start(500)
 
         # Model parameters
         self.model_box.currentTextChanged.connect(self.change_model)     
+        self.backend_box.currentTextChanged.connect(self.change_backend)
+        self.precision_box.currentTextChanged.connect(self.change_precision)
         self.iou_spinbox.valueChanged.connect(lambda x:self.change_val(x, 'iou_spinbox'))    # iou box
         self.iou_slider.valueChanged.connect(lambda x:self.change_val(x, 'iou_slider'))      # iou scroll bar
         self.conf_spinbox.valueChanged.connect(lambda x:self.change_val(x, 'conf_spinbox'))  # conf box
@@ -364,66 +138,101 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # Other function buttons
         self.save_res_button.toggled.connect(self.is_save_res)  # save image option
         self.save_txt_button.toggled.connect(self.is_save_txt)  # Save label option
+        self.headless_button.toggled.connect(self.is_headless)  # no display frames while hidden
         self.ToggleBotton.clicked.connect(lambda: UIFuncitons.toggleMenu(self, True))   # left navigation button
         self.settings_button.clicked.connect(lambda: UIFuncitons.settingBox(self, True))   # top right settings button
         
         # initialization
         self.load_config()
 
-    # The main window displays the original image and detection results
+    # The main window displays the original image and detection results (FrameView paints BGR directly)
     @staticmethod
-    def show_image(img_src, label):
+    def show_image(img_src, label, overlay=None):
         try:
-            ih, iw, _ = img_src.shape
-            w = label.geometry().width()
-            h = label.geometry().height()
-            # keep the original data ratio
-            if iw/w > ih/h:
-                scal = w / iw
-                nw = w
-                nh = int(scal * ih)
-                img_src_ = cv2.resize(img_src, (nw, nh))
-
-            else:
-                scal = h / ih
-                nw = int(scal * iw)
-                nh = h
-                img_src_ = cv2.resize(img_src, (nw, nh))
-
-            frame = cv2.cvtColor(img_src_, cv2.COLOR_BGR2RGB)
-            img = QImage(frame.data, frame.shape[1], frame.shape[0], frame.shape[2] * frame.shape[1],
-                         QImage.Format_RGB888)
-            label.setPixmap(QPixmap.fromImage(img))
+            label.setFrame(img_src, overlay)
 
         except Exception as e:
             print(repr(e))
 
+    # The video panels can be seen: window shown, not minimized and exposed
+    # (a fully covered window is reported as not exposed where the platform supports it)
+    def panels_visible(self):
+        window = self.windowHandle()
+        return self.isVisible() and not self.isMinimized() and window is not None and window.isExposed()
+
+    # Display tick: source and result of the newest frame, if one arrived since the last tick.
+    # Nothing is resized or painted while the panels cannot be seen; in headless mode the
+    # pipeline also stops producing display frames and annotations until they can.
+    def show_frames(self):
+        visible = self.panels_visible()
+        self.yolo_predict.display = visible or not self.headless_button.isChecked()
+        if not visible:
+            return
+        item = self.yolo_predict.frames.take()
+        if item is None:
+            return
+        pre_img, res_img, overlay = item
+        t = time.perf_counter()
+        self.show_image(pre_img, self.pre_video)
+        self.show_image(res_img, self.res_video, overlay)
+        self.yolo_predict.latency.record('display', (time.perf_counter() - t) * 1E3)
+
+    # Telemetry tick: the newest statistics snapshot, widgets are only touched for values that changed
+    def show_telemetry(self):
+        snapshot = self.yolo_predict.telemetry.snapshot(self.telemetry_seq)
+        if snapshot is None:
+            return
+        self.telemetry_seq, values = snapshot
+        counts, fps = values['counts'], values['fps']
+        self.set_text(self.fps_label, '--' if fps is None else fps)
+        self.set_text(self.Class_num, '--' if counts is None else str(counts.class_num))
+        self.set_text(self.Target_num, '--' if counts is None else str(counts.target_num))
+        if self.progress_bar.value() != values['progress']:
+            self.progress_bar.setValue(values['progress'])
+        latency = '  '.join(f'{k} {v:.1f}ms' for k, v in values['latency'].items())
+        tip = '\n'.join(t for t in (values['queues'], latency) if t)
+        if self.Fps_QF.toolTip() != tip:
+            self.Fps_QF.setToolTip(tip)
+
+    # Performance tick: latency percentiles are only computed while the settings page is open
+    def show_performance(self):
+        if self.prm_page.width() == 0:
+            return
+        self.set_text(self.perf_label, self.yolo_predict.performance())
+
+    @staticmethod
+    def set_text(label, text):
+        if label.text() != text:
+            label.setText(text)
+
     # Control start/pause
     def run_or_continue(self):
         if self.yolo_predict.source == '':
             self.show_status('Please select a video source before starting detection...')
             self.run_button.setChecked(False)
         else:
-            self.yolo_predict.stop_dtc = False
             if self.run_button.isChecked():
                 self.run_button.setChecked(True)    # start button
                 self.save_txt_button.setEnabled(False)  # It is forbidden to check and save after starting the detection
                 self.save_res_button.setEnabled(False)
                 self.show_status('Detecting...')           
-                self.yolo_predict.continue_dtc = True   # Control whether Yolo is paused
                 if not self.yolo_thread.isRunning():
+                    self.yolo_predict.control.reset()   # forget stop/pause sent while idle
                     self.yolo_thread.start()
                     self.main2yolo_begin_sgl.emit()
+                else:
+                    self.yolo_predict.control.send('resume')
 
             else:
-                self.yolo_predict.continue_dtc = False
+                self.yolo_predict.control.send('pause')     # Control whether Yolo is paused
                 self.show_status("Pause...")
                 self.run_button.setChecked(False)    # start button
 
     # bottom status bar information
     def show_status(self, msg):
         self.status_bar.setText(msg)
-        if msg == 'Detection completed' or msg == '检测完成':
+        if msg.startswith('Detection completed') or msg == '检测完成':
+            self.show_telemetry()               # last statistics of the run
             self.save_res_button.setEnabled(True)
             self.save_txt_button.setEnabled(True)
             self.run_button.setChecked(False)    
@@ -431,6 +240,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             if self.yolo_thread.isRunning():
                 self.yolo_thread.quit()         # end process
         elif msg == 'Detection terminated!' or msg == '检测终止':
+            self.show_telemetry()               # consume what the run published, then clear
             self.save_res_button.setEnabled(True)
             self.save_txt_button.setEnabled(True)
             self.run_button.setChecked(False)    
@@ -554,6 +364,14 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.show_status('NOTE: Labels results will be saved.')
             self.yolo_predict.save_txt = True
 
+    # Headless while hidden option
+    def is_headless(self):
+        if self.headless_button.isChecked():
+            self.show_status('NOTE: No display frames are rendered while the window is hidden.')
+        else:
+            self.show_status('NOTE: Display frames are rendered while the window is hidden.')
+            self.yolo_predict.display = True
+
     # Configuration initialization  ~~~wait to change~~~
     def load_config(self):
         config_file = 'config/setting.json'
@@ -563,33 +381,74 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             rate = 10
             save_res = 0   
             save_txt = 0    
+            batch = 1
+            backends = {}
+            precision = PRECISIONS[0]
+            overlay = 1
+            headless = 1
+            write_policy = 'spill'
             new_config = {"iou": iou,
                           "conf": conf,
                           "rate": rate,
                           "save_res": save_res,
-                          "save_txt": save_txt
+                          "save_txt": save_txt,
+                          "batch": batch,
+                          "backends": backends,
+                          "precision": precision,
+                          "overlay": overlay,
+                          "headless": headless,
+                          "write_policy": write_policy
                           }
             new_json = json.dumps(new_config, ensure_ascii=False, indent=2)
             with open(config_file, 'w', encoding='utf-8') as f:
                 f.write(new_json)
         else:
             config = json.load(open(config_file, 'r', encoding='utf-8'))
-            if len(config) != 5:
+            if len(config) < 5:
                 iou = 0.26
                 conf = 0.33
                 rate = 10
                 save_res = 0
                 save_txt = 0
+                batch = 1
+                backends = {}
+                precision = PRECISIONS[0]
+                overlay = 1
+                headless = 1
+                write_policy = 'spill'
             else:
                 iou = config['iou']
                 conf = config['conf']
                 rate = config['rate']
                 save_res = config['save_res']
                 save_txt = config['save_txt']
+                batch = config.get('batch', 1)     # frames per model call for video/folder sources
+                backends = config.get('backends', {})  # backend chosen for each model file
+                precision = config.get('precision', PRECISIONS[0])
+                overlay = config.get('overlay', 1)     # boxes as a vector overlay on the result panel
+                headless = config.get('headless', 1)   # no display frames while the window is hidden
+                write_policy = config.get('write_policy', 'spill')  # full encoder queue: 'block', 'drop' or 'spill'
         self.save_res_button.setCheckState(Qt.CheckState(save_res))
         self.yolo_predict.save_res = (False if save_res==0 else True )
         self.save_txt_button.setCheckState(Qt.CheckState(save_txt)) 
         self.yolo_predict.save_txt = (False if save_txt==0 else True )
+        self.yolo_predict.batch_size = max(int(batch), 1)
+        self.yolo_predict.vector_overlay = bool(overlay)
+        self.yolo_predict.write_policy = write_policy if write_policy in ResultWriter.POLICIES else 'spill'
+        self.headless_button.blockSignals(True)
+        self.headless_button.setChecked(bool(headless))
+        self.headless_button.blockSignals(False)
+        self.model_backends = backends
+        backend = backends.get(self.select_model, BACKENDS[0])
+        self.backend_box.blockSignals(True)
+        self.backend_box.setCurrentText(backend)
+        self.backend_box.blockSignals(False)
+        self.yolo_predict.backend = backend
+        self.precision_box.blockSignals(True)
+        self.precision_box.setCurrentText(precision)
+        self.precision_box.blockSignals(False)
+        self.backend_box.setEnabled(precision == PRECISIONS[0])
+        self.yolo_predict.precision = precision
         self.run_button.setChecked(False)  
         self.show_status("Welcome~")
 
@@ -597,7 +456,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def stop(self):
         if self.yolo_thread.isRunning():
             self.yolo_thread.quit()         # end thread
-        self.yolo_predict.stop_dtc = True
+        self.yolo_predict.control.send('stop')
+        self.yolo_predict.frames.clear()    # nothing left to show
+        self.yolo_predict.pred_cache.clear()    # and nothing to redraw on a threshold change
         self.run_button.setChecked(False)    # start key recovery
         self.save_res_button.setEnabled(True)   # Ability to use the save button
         self.save_txt_button.setEnabled(True)   # Ability to use the save button
@@ -615,27 +476,46 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         elif flag == 'iou_slider':
             self.iou_spinbox.setValue(x/100)        # The slider value changes, changing the box
             self.show_status('IOU Threshold: %s' % str(x/100))
-            self.yolo_predict.iou_thres = x/100
+            self.yolo_predict.control.send('iou', x/100)
+            self.yolo_predict.redraw_idle()
         elif flag == 'conf_spinbox':
             self.conf_slider.setValue(int(x*100))
         elif flag == 'conf_slider':
             self.conf_spinbox.setValue(x/100)
             self.show_status('Conf Threshold: %s' % str(x/100))
-            self.yolo_predict.conf_thres = x/100
+            self.yolo_predict.control.send('conf', x/100)
+            self.yolo_predict.redraw_idle()
         elif flag == 'speed_spinbox':
             self.speed_slider.setValue(x)
         elif flag == 'speed_slider':
             self.speed_spinbox.setValue(x)
-            self.show_status('Delay: %s ms' % str(x))
+            self.show_status('Frame budget: %s ms' % str(x) if x else 'Frame budget: as fast as possible')
             self.yolo_predict.speed_thres = x  # ms
             
     # change model
     def change_model(self,x):
         self.select_model = self.model_box.currentText()
-        self.yolo_predict.new_model_name = "./models/%s" % self.select_model
+        backend = self.model_backends.get(self.select_model, BACKENDS[0])
+        self.backend_box.blockSignals(True)
+        self.backend_box.setCurrentText(backend)
+        self.backend_box.blockSignals(False)
+        self.yolo_predict.control.send('backend', backend)
+        self.yolo_predict.control.send('model', "./models/%s" % self.select_model)
         self.show_status('Change Model：%s' % self.select_model)
         self.Model_name.setText(self.select_model)
 
+    # change the inference backend of the selected model
+    def change_backend(self, x):
+        self.model_backends[self.select_model] = x
+        self.yolo_predict.control.send('backend', x)
+        self.show_status('Change Backend：%s (%s)' % (x, self.select_model))
+
+    # change the model precision (INT8 is quantized and cached on first use)
+    def change_precision(self, x):
+        self.backend_box.setEnabled(x == PRECISIONS[0])     # INT8 always runs on ONNX Runtime
+        self.yolo_predict.control.send('precision', x)
+        self.show_status('Change Precision：%s' % x)
+
     # label result
     # def show_labels(self, labels_dic):
     #     try:
@@ -678,18 +558,23 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         config['rate'] = self.speed_spinbox.value()
         config['save_res'] = (0 if self.save_res_button.checkState()==Qt.Unchecked else 2)
         config['save_txt'] = (0 if self.save_txt_button.checkState()==Qt.Unchecked else 2)
+        config['batch'] = self.yolo_predict.batch_size
+        config['overlay'] = int(self.yolo_predict.vector_overlay)
+        config['headless'] = int(self.headless_button.isChecked())
+        config['write_policy'] = self.yolo_predict.write_policy
+        config['backends'] = self.model_backends
+        config['precision'] = self.precision_box.currentText()
         config_json = json.dumps(config, ensure_ascii=False, indent=2)
         with open(config_file, 'w', encoding='utf-8') as f:
             f.write(config_json)
         # Exit the process before closing
         if self.yolo_thread.isRunning():
-            self.yolo_predict.stop_dtc = True
+            self.yolo_predict.control.send('stop')
             self.yolo_thread.quit()
             MessageBox(
                 self.close_button, title='Note', text='Exiting, please wait...', time=3000, auto=True).exec()
-            sys.exit(0)
-        else:
-            sys.exit(0)
+        self.yolo_predict.model_pool.close()    # drop the warm models, don't wait for one still loading
+        sys.exit(0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,109 @@
+from PySide6.QtCore import Qt, QRectF
+from PySide6.QtGui import QImage, QPainter, QColor, QPen
+from PySide6.QtWidgets import QLabel
+import numpy as np
+import cv2
+
+
+# Video panel that paints BGR frames itself: the frame is resized once into a buffer kept for
+# the current panel size, wrapped in a Format_BGR888 QImage without copying and drawn in
+# paintEvent, so there is no BGR->RGB conversion, no QPixmap upload and no per-frame allocation.
+# Detections can be painted over the frame as vector graphics instead of being burnt into its pixels.
+class FrameView(QLabel):
+    def __init__(self, parent=None):
+        super(FrameView, self).__init__(parent)
+        self.frame = None               # last frame set (not copied, must not be modified by the caller)
+        self.buffer = None              # resized frame, reused while the display size stays the same
+        self.image = None               # QImage over self.buffer (or over the frame when no resize is needed)
+        self.fit = None                 # (frame h, frame w, panel h, panel w) -> display size, of the last frame
+        self.size_hw = None
+        self.overlay = None             # (xyxy (n, 4) in frame pixels, labels, RGB colors) or None
+
+    # Replace a QLabel created by the generated UI with a FrameView in the same splitter slot
+    @classmethod
+    def replace(cls, label):
+        view = cls(label.parentWidget())
+        view.setObjectName(label.objectName())
+        view.setMinimumSize(label.minimumSize())
+        view.setStyleSheet(label.styleSheet())
+        view.setAlignment(label.alignment())
+        splitter = label.parentWidget()
+        splitter.replaceWidget(splitter.indexOf(label), view)
+        label.deleteLater()
+        return view
+
+    # Display size keeping the frame's aspect ratio inside the panel
+    def display_size(self, ih, iw):
+        key = (ih, iw, self.height(), self.width())
+        if key != self.fit:
+            w, h = max(self.width(), 1), max(self.height(), 1)
+            if iw / w > ih / h:
+                self.size_hw = max(int(w / iw * ih), 1), w
+            else:
+                self.size_hw = h, max(int(h / ih * iw), 1)
+            self.fit = key
+        return self.size_hw
+
+    def setFrame(self, frame, overlay=None):
+        self.frame = frame
+        self.overlay = overlay
+        self.render_frame()
+        self.update()
+
+    def render_frame(self):
+        frame = self.frame
+        if frame is None:
+            self.image = None
+            return
+        h, w = self.display_size(*frame.shape[:2])
+        if (h, w) == frame.shape[:2] and frame.flags['C_CONTIGUOUS']:
+            im = frame
+        else:
+            if self.buffer is None or self.buffer.shape[:2] != (h, w):
+                self.buffer = np.empty((h, w, 3), dtype=np.uint8)
+            im = cv2.resize(frame, (w, h), dst=self.buffer, interpolation=cv2.INTER_LINEAR)
+        self.image = QImage(im.data, w, h, im.strides[0], QImage.Format_BGR888)
+
+    def clear(self):
+        self.frame = None
+        self.image = None
+        self.overlay = None
+        super(FrameView, self).clear()
+        self.update()
+
+    def resizeEvent(self, event):
+        super(FrameView, self).resizeEvent(event)
+        if self.frame is not None:
+            self.render_frame()         # re-fit the last frame, the next one may take a while
+
+    def paintEvent(self, event):
+        super(FrameView, self).paintEvent(event)     # style sheet background and border
+        if self.image is None:
+            return
+        painter = QPainter(self)
+        x = (self.width() - self.image.width()) // 2
+        y = (self.height() - self.image.height()) // 2
+        painter.drawImage(x, y, self.image)
+        if self.overlay is not None:
+            self.paint_overlay(painter, x, y)
+        painter.end()
+
+    # Boxes and labels scaled from frame to display coordinates, label above the box (inside at the top edge)
+    def paint_overlay(self, painter, x, y):
+        boxes, labels, rgb = self.overlay
+        sx = self.image.width() / self.frame.shape[1]
+        sy = self.image.height() / self.frame.shape[0]
+        metrics = painter.fontMetrics()
+        th = metrics.height()
+        for (x1, y1, x2, y2), label, c in zip(boxes.tolist(), labels, rgb):
+            color = QColor(*c)
+            rect = QRectF(x + x1 * sx, y + y1 * sy, (x2 - x1) * sx, (y2 - y1) * sy)
+            painter.setPen(QPen(color, 2))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(rect)
+            if label:
+                top = rect.top() - th if rect.top() - th >= y else rect.top()
+                tag = QRectF(rect.left(), top, metrics.horizontalAdvance(label) + 6, th)
+                painter.fillRect(tag, color)
+                painter.setPen(Qt.white)
+                painter.drawText(tag, Qt.AlignCenter, label)
@@ -0,0 +1,135 @@
+from ultralytics.nn.autobackend import AutoBackend
+from ultralytics.yolo.data import load_inference_source
+from ultralytics.yolo.utils import LOGGER
+from ultralytics.yolo.utils.checks import check_requirements
+from utils.preprocess import FusedPreprocessor, raw_frame
+from pathlib import Path
+import tempfile
+import hashlib
+import shutil
+import torch
+import re
+import os
+
+
+BACKENDS = ('PyTorch', 'ONNX Runtime')     # inference backends selectable per model
+PRECISIONS = ('FP32', 'INT8 (CPU)')        # INT8 always runs a quantized ONNX model on ONNX Runtime
+
+
+def file_hash(path, chunk=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            h.update(block)
+    return h.hexdigest()[:12]
+
+
+# Export a .pt model to ONNX once, cached next to the weights as <stem>-<hash>-<imgsz>-op<opset>.onnx,
+# so a retrained file with the same name gets a fresh export. ultralytics writes <stem>.onnx next to
+# the weights it exports, so it works on a copy in a temp dir and a user's own <stem>.onnx is left alone.
+def export_onnx(weights, imgsz=640, opset=12):
+    weights = Path(weights)
+    size = imgsz if isinstance(imgsz, int) else max(imgsz)
+    cached = weights.with_name(f'{weights.stem}-{file_hash(weights)}-{size}-op{opset}.onnx')
+    if cached.exists():
+        return cached
+    from ultralytics import YOLO
+    LOGGER.info(f'Exporting {weights.name} to ONNX (imgsz={size}, opset={opset})...')
+    with tempfile.TemporaryDirectory(dir=weights.parent) as tmp:    # same file system, os.replace works
+        copy = shutil.copy2(weights, Path(tmp) / weights.name)
+        exported = YOLO(str(copy)).export(format='onnx', imgsz=size, opset=opset, dynamic=True)
+        os.replace(exported, cached)
+    return cached
+
+
+# ONNX Runtime CPU session with all graph optimizations enabled
+def onnx_session(path, threads=0):
+    check_requirements('onnxruntime')
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = threads     # 0: one thread per physical core
+    return ort.InferenceSession(str(path), sess_options=options, providers=['CPUExecutionProvider'])
+
+
+# Up to n preprocessed frames (1, 3, imgsz, imgsz float32) sampled from a file, folder or stream,
+# used to calibrate static INT8 quantization on data that looks like what will be detected
+def calibration_frames(source, imgsz=640, n=32, vid_stride=10):
+    dataset = load_inference_source(source=source, transforms=raw_frame, imgsz=imgsz, vid_stride=vid_stride)
+    preprocessor = FusedPreprocessor(imgsz, auto=False)
+    frames = []
+    for _, im, _, _, _ in dataset:
+        for x in preprocessor(im, 'cpu'):
+            frames.append(x[None].numpy().copy())   # the input buffer is reused, keep a copy
+        if len(frames) >= n:
+            break
+    return frames[:n]
+
+
+# INT8 variant of an ONNX export, cached next to it.
+# With calibration frames: static QDQ quantization (per-channel weights, calibrated activations);
+# the Detect head stays in float because box coordinates and class scores share one output tensor.
+# Without: dynamic quantization of the weights only.
+def quantize_onnx(onnx, calibration=None):
+    onnx = Path(onnx)
+    static = onnx.with_name(f'{onnx.stem}-int8s.onnx')
+    dynamic = onnx.with_name(f'{onnx.stem}-int8d.onnx')
+    if static.exists():
+        return static
+    frames = calibration() if callable(calibration) else calibration
+    if not frames:
+        if not dynamic.exists():
+            check_requirements(('onnx', 'onnxruntime'))
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            LOGGER.info(f'Dynamic INT8 quantization of {onnx.name} (no calibration frames)...')
+            quantize_dynamic(str(onnx), str(dynamic), weight_type=QuantType.QUInt8)
+        return dynamic
+
+    check_requirements(('onnx', 'onnxruntime'))
+    import onnx as onnx_lib
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    graph = onnx_lib.load(str(onnx)).graph
+    layers = [int(m.group(1)) for m in (re.match(r'/model\.(\d+)/', n.name) for n in graph.node) if m]
+    head = f'/model.{max(layers)}/' if layers else None
+    exclude = [n.name for n in graph.node if head and n.name.startswith(head)]
+    input_name = graph.input[0].name
+
+    class Reader(CalibrationDataReader):
+        def __init__(self):
+            self.frames = iter(frames)
+
+        def get_next(self):
+            x = next(self.frames, None)
+            return None if x is None else {input_name: x}
+
+    LOGGER.info(f'Static INT8 quantization of {onnx.name} with {len(frames)} calibration frames...')
+    quantize_static(str(onnx), str(static), Reader(),
+                    quant_format=QuantFormat.QDQ,
+                    per_channel=True,
+                    weight_type=QuantType.QInt8,
+                    activation_type=QuantType.QUInt8,
+                    nodes_to_exclude=exclude)
+    return static
+
+
+# Load `weights` (.pt) for the chosen backend. Every backend is wrapped in ultralytics' AutoBackend,
+# so YoloPredictor's preprocess/postprocess see the same inputs and outputs whichever one runs.
+# calibration: frames, or a callable returning them, for static INT8 quantization
+def load_backend(weights, backend='PyTorch', device=None, imgsz=640, half=False, dnn=False, data=None,
+                 precision='FP32', calibration=None, opset=12, threads=0, verbose=True):
+    if precision == 'INT8 (CPU)':
+        onnx = quantize_onnx(export_onnx(weights, imgsz=imgsz, opset=opset), calibration)
+        model = AutoBackend(str(onnx), device=torch.device('cpu'), dnn=dnn, data=data, fp16=False,
+                            verbose=verbose)
+        model.session = onnx_session(onnx, threads)
+        return model
+    if backend == 'ONNX Runtime':
+        onnx = export_onnx(weights, imgsz=imgsz, opset=opset)
+        model = AutoBackend(str(onnx), device=torch.device('cpu'), dnn=dnn, data=data, fp16=False,
+                            verbose=verbose)
+        model.session = onnx_session(onnx, threads)     # replace the default session with a tuned one
+        return model
+    assert backend == 'PyTorch', f'unknown backend {backend}, expected one of {BACKENDS}'
+    return AutoBackend(weights, device=device, dnn=dnn, data=data, fp16=half, fuse=True, verbose=verbose)
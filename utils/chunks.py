@@ -0,0 +1,178 @@
+from ultralytics.yolo.utils import LOGGER, ops
+from ultralytics.yolo.utils.plotting import Annotator, colors
+from ultralytics.yolo.utils.torch_utils import select_device
+from utils.backends import calibration_frames, export_onnx, load_backend, quantize_onnx
+from utils.preprocess import FusedPreprocessor
+from utils.detections import DetectionBatch
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+import numpy as np
+import subprocess
+import shutil
+import json
+import time
+import torch
+import cv2
+import os
+
+
+# Frame indices of the keyframes of a video, from packet flags so nothing is decoded.
+# None when ffprobe is not installed or fails.
+def keyframes(path, fps):
+    if shutil.which('ffprobe') is None:
+        return None
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags',
+           '-of', 'csv=p=0', str(path)]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    frames = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' in flags and pts not in ('', 'N/A'):
+            frames.append(int(round(float(pts) * fps)))
+    return sorted(set(frames)) or None
+
+
+# Split [0, total) into about `n` ranges, each boundary moved to the nearest keyframe
+# so every worker starts decoding on a frame that does not depend on the previous chunk
+def plan_chunks(total, n, keys=None):
+    bounds = [round(total * i / n) for i in range(1, n)]
+    if keys:
+        keys = np.asarray(keys)
+        bounds = [int(keys[np.abs(keys - b).argmin()]) for b in bounds]
+    bounds = sorted({b for b in bounds if 0 < b < total})
+    starts, ends = [0] + bounds, bounds + [total]
+    return list(zip(starts, ends))
+
+
+# Process pool worker: detect frames [start, end) of `path` with its own model and thread budget.
+# Returns (start, [(frame index, (n, 6) xyxy/conf/cls float32)], segment file or None, class names)
+def detect_chunk(path, start, end, weights, backend, precision, device, imgsz, conf, iou, threads, segment):
+    torch.set_num_threads(max(threads, 1))
+    model = load_backend(weights, backend=backend, device=select_device(device, verbose=False), imgsz=imgsz,
+                         precision=precision, threads=threads, verbose=False)
+    model.eval()
+    preprocessor = FusedPreprocessor(imgsz, stride=model.stride, auto=model.pt)
+    cap = cv2.VideoCapture(str(path))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    writer, records = None, []
+    with torch.no_grad():
+        for index in range(start, end):
+            ok, im0 = cap.read()
+            if not ok:
+                break
+            im = preprocessor(im0, model.device, half=model.fp16)
+            preds = ops.non_max_suppression(model(im), conf, iou, max_det=300)
+            pred = preds[0]
+            pred[:, :4] = ops.scale_boxes(im.shape[2:], pred[:, :4], im0.shape).round()
+            det = DetectionBatch.from_pred(pred, im0, str(path), model.names)
+            records.append((index, det.data()))
+            if segment is not None:
+                if writer is None:
+                    h, w = im0.shape[:2]
+                    writer = cv2.VideoWriter(segment, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+                annotator = Annotator(im0, example=str(model.names))
+                for box, c, p in zip(det.xyxy.tolist(), det.cls.tolist(), det.conf.tolist()):
+                    annotator.box_label(box, f'{model.names[c]} {p:.2f}', color=colors(c, True))
+                writer.write(annotator.result())
+    cap.release()
+    if writer is not None:
+        writer.release()
+    return start, records, segment if writer is not None else None, model.names
+
+
+# Join the annotated segments in order: stream copy with ffmpeg when available, re-encode with cv2 otherwise
+def concat_segments(segments, out):
+    if shutil.which('ffmpeg') is not None:
+        listing = Path(out).with_suffix('.txt')
+        listing.write_text(''.join(f"file '{Path(s).resolve().as_posix()}'\n" for s in segments))
+        try:
+            subprocess.run(['ffmpeg', '-y', '-v', 'error', '-f', 'concat', '-safe', '0', '-i', str(listing),
+                            '-c', 'copy', str(out)], check=True)
+            return
+        except (OSError, subprocess.CalledProcessError) as e:
+            LOGGER.warning(f'ffmpeg concat failed ({e}), re-encoding with OpenCV')
+        finally:
+            listing.unlink(missing_ok=True)
+    writer = None
+    for segment in segments:
+        cap = cv2.VideoCapture(segment)
+        while True:
+            ok, im = cap.read()
+            if not ok:
+                break
+            if writer is None:
+                h, w = im.shape[:2]
+                writer = cv2.VideoWriter(str(out), cv2.VideoWriter_fourcc(*'mp4v'), cap.get(cv2.CAP_PROP_FPS), (w, h))
+            writer.write(im)
+        cap.release()
+    if writer is not None:
+        writer.release()
+
+
+# Offline detection of one video file split into keyframe-aligned chunks over `workers` processes.
+# Detections are merged in frame order into <save_dir>/detections.jsonl (same records as the
+# predictor's save_json) and/or <save_dir>/labels/<video stem>.txt (the predictor's video label
+# format, 'frame cls x y w h'), annotated segments optionally into <save_dir>/<video name>.
+# Returns the number of frames processed.
+def detect_chunked(path, save_dir, weights, workers=None, threads=0, backend='PyTorch', precision='FP32',
+                   device='', imgsz=640, conf=0.25, iou=0.45, save_video=False, save_json=True, save_txt=False):
+    path, save_dir = Path(path), Path(save_dir)
+    workers = workers or os.cpu_count()
+    threads = threads or max(os.cpu_count() // workers, 1)     # split the cores, no oversubscription
+    cap = cv2.VideoCapture(str(path))
+    total, fps = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS)
+    shape = [int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))]
+    cap.release()
+    assert total > 0, f'cannot read frame count of {path}'
+    keys = keyframes(path, fps)
+    chunks = plan_chunks(total, workers, keys)
+    LOGGER.info(f'{path.name}: {total} frames in {len(chunks)} chunks '
+                f'({"keyframe-aligned" if keys else "even ranges, ffprobe not found"}), '
+                f'{workers} workers x {threads} threads')
+
+    # export/quantize once here, the workers then all load the cached file
+    if backend != 'PyTorch' or precision != 'FP32':
+        onnx = export_onnx(weights, imgsz=imgsz)
+        if precision != 'FP32':
+            quantize_onnx(onnx, lambda: calibration_frames(str(path), imgsz=imgsz))
+
+    segments_dir = save_dir / 'segments'
+    if save_video or save_json or save_txt:
+        (segments_dir if save_video else save_dir).mkdir(parents=True, exist_ok=True)
+    results = []
+    t = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        futures = [pool.submit(detect_chunk, str(path), start, end, str(weights), backend, precision, device, imgsz,
+                               conf, iou, threads, str(segments_dir / f'{k:04d}.mp4') if save_video else None)
+                   for k, (start, end) in enumerate(chunks)]
+        for future in futures:
+            results.append(future.result())
+            LOGGER.info(f'chunk {len(results)}/{len(chunks)} done ({time.perf_counter() - t:.1f}s)')
+    results.sort(key=lambda r: r[0])
+
+    frames = sum(len(r[1]) for r in results)
+    if save_json:
+        with open(save_dir / 'detections.jsonl', 'w') as f:
+            for _, records, _, names in results:
+                for index, data in records:
+                    record = {'path': str(path), 'frame': index + 1, 'shape': shape,
+                              'boxes': np.round(data, 2).tolist(), 'names': [names[int(c)] for c in data[:, -1]]}
+                    f.write(json.dumps(record) + '\n')
+    if save_txt:
+        (save_dir / 'labels').mkdir(parents=True, exist_ok=True)
+        h, w = shape
+        with open(save_dir / 'labels' / f'{path.stem}.txt', 'w') as f:
+            for _, records, _, _ in results:
+                for index, data in records:
+                    for x1, y1, x2, y2, _, c in data[::-1].tolist():
+                        line = (index + 1, int(c), (x1 + x2) / 2 / w, (y1 + y2) / 2 / h, (x2 - x1) / w, (y2 - y1) / h)
+                        f.write(('%g ' * len(line)).rstrip() % line + '\n')
+    if save_video:
+        concat_segments([r[2] for r in results if r[2] is not None], save_dir / path.with_suffix('.mp4').name)
+        shutil.rmtree(segments_dir, ignore_errors=True)
+    return frames
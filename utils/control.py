@@ -0,0 +1,41 @@
+from collections import deque
+import threading
+
+
+# Commands understood by YoloPredictor:
+#   'pause', 'resume', 'stop'
+#   'model' (value: model path), 'iou' / 'conf' (value: threshold)
+TRANSPORT = ('pause', 'resume', 'stop')
+
+
+# Command queue from the GUI thread to the detection thread.
+# The detection loop drains it between frames and blocks on it while paused,
+# so a paused pipeline sleeps instead of polling flags and wakes on the next command.
+class ControlChannel:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.commands = deque()
+
+    def send(self, cmd, value=None):
+        with self.cond:
+            self.commands.append((cmd, value))
+            self.cond.notify_all()
+
+    # Pop every pending command, oldest first
+    def take(self):
+        with self.cond:
+            commands = list(self.commands)
+            self.commands.clear()
+        return commands
+
+    # Block until a command arrives (or timeout, s), True if one is pending
+    def wait(self, timeout=None):
+        with self.cond:
+            return self.cond.wait_for(lambda: len(self.commands) > 0, timeout)
+
+    # Drop pause/resume/stop left over from a previous run, keep model and threshold changes
+    def reset(self):
+        with self.cond:
+            kept = [c for c in self.commands if c[0] not in TRANSPORT]
+            self.commands.clear()
+            self.commands.extend(kept)
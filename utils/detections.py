@@ -0,0 +1,124 @@
+from ultralytics.yolo.engine.results import Results
+from collections import OrderedDict
+import numpy as np
+import threading
+import torch
+
+
+# Per-class detection counts of one frame, e.g. labels={'person': 3, 'car': 1}
+class DetectionCounts:
+    __slots__ = ('labels', 'class_num', 'target_num')
+
+    def __init__(self, labels=None):
+        self.labels = labels if labels is not None else {}     # class name -> number of boxes
+        self.class_num = len(self.labels)                      # number of categories detected
+        self.target_num = sum(self.labels.values())            # number of targets detected
+
+    # Count a 1-D tensor/array of class ids with a single bincount
+    @classmethod
+    def from_cls(cls, classes, names):
+        if len(classes) == 0:
+            return cls()
+        if torch.is_tensor(classes):
+            counts = torch.bincount(classes.long().view(-1)).tolist()
+        else:
+            counts = np.bincount(np.asarray(classes, dtype=np.int64).reshape(-1)).tolist()
+        return cls({names[c]: n for c, n in enumerate(counts) if n})
+
+    def __repr__(self):
+        return f'DetectionCounts({self.labels})'
+
+
+# Detections of one frame as plain NumPy arrays, used by the render stage instead of ultralytics'
+# Results/Boxes so annotating and saving do not go through per-box tensor calls.
+# to_results() builds the ultralytics object when it is actually needed (export, tracking, ...).
+class DetectionBatch:
+    __slots__ = ('xyxy', 'conf', 'cls', 'id', 'orig_img', 'orig_shape', 'path', 'names', 'speed')
+
+    def __init__(self, xyxy, conf, cls, id=None, orig_img=None, orig_shape=None, path='', names=None):
+        self.xyxy = xyxy                # (n, 4) float32 pixel boxes in orig_img
+        self.conf = conf                # (n,) float32
+        self.cls = cls                  # (n,) int64
+        self.id = id                    # (n,) int64 track ids or None
+        self.orig_img = orig_img
+        self.orig_shape = orig_shape if orig_shape is not None else orig_img.shape[:2]
+        self.path = path
+        self.names = names
+        self.speed = None
+
+    # pred: (n, 6) [x1, y1, x2, y2, conf, cls] or (n, 7) [x1, y1, x2, y2, id, conf, cls] tensor,
+    # copied to host once
+    @classmethod
+    def from_pred(cls, pred, orig_img, path, names):
+        pred = pred.detach().float().cpu().numpy()
+        return cls(xyxy=np.ascontiguousarray(pred[:, :4]),
+                   conf=pred[:, -2].copy(),
+                   cls=pred[:, -1].astype(np.int64),
+                   id=pred[:, 4].astype(np.int64) if pred.shape[1] == 7 else None,
+                   orig_img=orig_img,
+                   path=path,
+                   names=names)
+
+    def __len__(self):
+        return len(self.cls)
+
+    # Normalized center-x, center-y, width, height, as in YOLO label files
+    @property
+    def xywhn(self):
+        h, w = self.orig_shape
+        xywhn = np.empty_like(self.xyxy)
+        xywhn[:, 0] = (self.xyxy[:, 0] + self.xyxy[:, 2]) / 2 / w
+        xywhn[:, 1] = (self.xyxy[:, 1] + self.xyxy[:, 3]) / 2 / h
+        xywhn[:, 2] = (self.xyxy[:, 2] - self.xyxy[:, 0]) / w
+        xywhn[:, 3] = (self.xyxy[:, 3] - self.xyxy[:, 1]) / h
+        return xywhn
+
+    def counts(self):
+        return DetectionCounts.from_cls(self.cls, self.names)
+
+    def data(self):
+        cols = [self.xyxy] + ([self.id[:, None]] if self.id is not None else []) + [self.conf[:, None], self.cls[:, None]]
+        return np.concatenate(cols, axis=1).astype(np.float32)
+
+    def to_results(self):
+        results = Results(orig_img=self.orig_img, path=self.path, names=self.names,
+                          boxes=torch.from_numpy(self.data()))
+        results.speed = self.speed
+        return results
+
+
+# Raw model output of recent frames, so a conf/IoU change only has to re-run NMS.
+# key -> (pred (1, 4 + nc, anchors) tensor, model input shape, orig_img, path, names), oldest evicted first.
+# Image jobs keep up to `maxsize` entries (a folder can be re-run at NMS speed),
+# video and streams only their last frame. Only the newest entry keeps its orig_img (the frame
+# redraw() shows again), older ones drop it so a folder of 4K images does not stay in memory.
+class PredictionCache:
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, key, entry, keep=True):
+        with self.lock:
+            if not keep:
+                self.entries.clear()
+            newest = next(reversed(self.entries), None)
+            if newest is not None and newest != key:
+                old = self.entries[newest]
+                self.entries[newest] = old[:2] + (None,) + old[3:]
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def last(self):
+        with self.lock:
+            return next(reversed(self.entries.values()), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
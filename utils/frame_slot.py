@@ -0,0 +1,35 @@
+import threading
+
+
+# Latest-only handoff of display frames from the render stage to the GUI.
+# The render stage publishes into the back buffer and swaps it to the front, the GUI takes the
+# front one on its own refresh tick; a frame published before the previous one was taken replaces
+# it (counted in `dropped`), so at most two frames are ever held, however far behind the GUI is.
+class FrameSlot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffers = [None, None]     # front (newest), back (previous, possibly still on screen)
+        self.seq = 0                    # frames published
+        self.taken = 0                  # seq of the last frame taken
+        self.dropped = 0                # frames replaced before the GUI took them
+
+    def publish(self, item):
+        with self.lock:
+            if self.seq != self.taken:
+                self.dropped += 1
+            self.buffers[1] = item
+            self.buffers.reverse()
+            self.seq += 1
+
+    # The newest frame if it was not taken yet, None otherwise
+    def take(self):
+        with self.lock:
+            if self.seq == self.taken:
+                return None
+            self.taken = self.seq
+            return self.buffers[0]
+
+    def clear(self):
+        with self.lock:
+            self.buffers = [None, None]
+            self.taken = self.seq
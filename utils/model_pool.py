@@ -0,0 +1,138 @@
+from concurrent.futures import Future
+from collections import OrderedDict
+import threading
+import queue
+import torch
+import time
+import os
+
+
+# Approximate memory held by a loaded model: parameter and buffer bytes for PyTorch,
+# the size of the weights file for runtimes that keep their own copy (ONNX Runtime)
+def model_bytes(model, weights=None):
+    size = sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+    if size == 0 and weights and os.path.exists(weights):
+        size = os.path.getsize(weights)
+    return size
+
+
+# LRU pool of loaded and warmed-up models, keyed by (weights, backend, precision).
+# request() loads a model on a background thread while the current one keeps detecting,
+# get() hands it over once it is ready, so the caller can swap between two frames.
+# Least recently used models are dropped when the pool holds more than `capacity` models or
+# `max_mb` of weights; the model in use and the one just loaded are never dropped.
+class ModelPool:
+    def __init__(self, loader, capacity=3, max_mb=2048):
+        self.loader = loader            # key -> warmed-up model, called on the loading thread
+        self.capacity = capacity
+        self.max_bytes = max_mb * (1 << 20)
+        self.models = OrderedDict()     # key -> (model, bytes), most recently used last
+        self.loading = {}               # key -> Future
+        self.errors = {}                # key -> exception of a failed background load
+        self.load_times = {}            # key -> seconds the last load and warmup took
+        self.in_use = None
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()   # (key, Future) for the loading thread, None to stop it
+        # daemon thread, a load still running at exit must not keep the interpreter alive
+        self.worker = threading.Thread(target=self.work, name='model-pool', daemon=True)
+        self.worker.start()
+
+    # Start loading `key` in the background unless it is already loaded or loading
+    def request(self, key):
+        with self.lock:
+            if key in self.models or key in self.loading:
+                return
+            self.errors.pop(key, None)
+            self.loading[key] = future = Future()
+        self.requests.put((key, future))
+
+    # Loading thread: one background load at a time, in request order
+    def work(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                break
+            key, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self.load_model(key))
+            except Exception as e:
+                future.set_exception(e)
+
+    # The model for `key` if it is ready, None while it is still loading (or not requested)
+    def get(self, key):
+        with self.lock:
+            if key not in self.models:
+                return None
+            self.models.move_to_end(key)
+            return self.models[key][0]
+
+    # The model for `key`, loading it on the calling thread (or waiting for the background load,
+    # concurrent.futures.TimeoutError after `timeout` seconds)
+    def load(self, key, timeout=None):
+        model = self.get(key)
+        if model is not None:
+            return model
+        with self.lock:
+            future = self.loading.get(key)
+        if future is not None:
+            future.result(timeout)      # re-raises a failed background load
+            return self.get(key)
+        self.load_model(key)
+        return self.get(key)
+
+    # Mark `key` as the model being detected with, so eviction keeps it
+    def use(self, key):
+        with self.lock:
+            self.in_use = key
+            if key in self.models:
+                self.models.move_to_end(key)
+            self.evict()
+
+    def load_model(self, key):
+        try:
+            t = time.perf_counter()
+            with torch.no_grad():
+                model = self.loader(key)
+            self.load_times[key] = time.perf_counter() - t
+            size = model_bytes(model, key[0])
+            with self.lock:
+                self.models[key] = (model, size)
+                self.models.move_to_end(key)
+                self.evict(keep=key)
+        except Exception as e:
+            with self.lock:
+                self.errors[key] = e
+            raise
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+
+    # Error of a failed background load of `key` (once), None otherwise
+    def error(self, key):
+        with self.lock:
+            return self.errors.pop(key, None)
+
+    # Called with the lock held
+    def evict(self, keep=None):
+        freed = False
+        while len(self.models) > 1 and (len(self.models) > self.capacity or
+                                        sum(size for _, size in self.models.values()) > self.max_bytes):
+            key = next((k for k in self.models if k not in (self.in_use, keep)), None)    # least recently used first
+            if key is None:
+                break
+            del self.models[key]
+            freed = True
+        if freed and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    # Cancel the loads that have not started and drop the models, without waiting for a running load
+    def close(self):
+        with self.lock:
+            for future in self.loading.values():
+                future.cancel()
+            self.loading.clear()
+            self.models.clear()
+            self.in_use = None
+        self.requests.put(None)
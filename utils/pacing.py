@@ -0,0 +1,30 @@
+import time
+
+
+# Paces a processing loop to a per-frame deadline.
+# wait() sleeps only for what is left of the frame budget after the work already done,
+# so a slow frame is not delayed further; a budget of 0 runs as fast as possible.
+class FramePacer:
+    def __init__(self, budget=0.0):
+        self.budget = budget            # s per frame, 0 = as fast as possible
+        self.last = None                # deadline of the previous frame
+
+    def set_fps(self, fps):
+        self.budget = 1 / fps if fps > 0 else 0.0
+
+    def reset(self):
+        self.last = None
+
+    # Call once per processed batch of `frames` frames, returns the time slept, s
+    def wait(self, frames=1):
+        if self.budget <= 0:
+            self.last = None
+            return 0.0
+        now = time.perf_counter()
+        target = now if self.last is None else self.last + self.budget * frames
+        if target > now:
+            time.sleep(target - now)
+            self.last = target
+            return target - now
+        self.last = now                 # behind schedule: restart from now instead of bursting to catch up
+        return 0.0
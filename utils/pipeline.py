@@ -0,0 +1,98 @@
+import queue
+import threading
+
+
+STOP = object()     # end-of-stream marker passed from one stage to the next
+
+
+# Bounded queue between two pipeline stages, remembers its peak depth for monitoring
+class StageQueue(queue.Queue):
+    def __init__(self, name, maxsize=4):
+        super(StageQueue, self).__init__(maxsize)
+        self.name = name
+        self.peak = 0
+
+    def _put(self, item):
+        super(StageQueue, self)._put(item)
+        self.peak = max(self.peak, len(self.queue))
+
+    @property
+    def depth(self):
+        return self.qsize()
+
+
+# One-slot queue for live sources: put() never waits, a newer item replaces the one still waiting,
+# so the consumer always gets the newest frame instead of one that aged in a deeper queue.
+# Replaced items are counted in `dropped`.
+class LatestQueue(StageQueue):
+    def __init__(self, name):
+        super(LatestQueue, self).__init__(name, maxsize=1)
+        self.dropped = 0
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            if self.queue:
+                self.queue.popleft()
+                self.unfinished_tasks -= 1
+                self.dropped += 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+
+# One pipeline stage running in its own thread:
+#   src is None  -> source stage, func() produces items until it raises StopIteration
+#   dst is None  -> sink stage, func(item) consumes items
+#   otherwise    -> func(item) maps every item of src into dst
+class StageWorker(threading.Thread):
+    def __init__(self, name, func, src=None, dst=None, timeout=0.1):
+        super(StageWorker, self).__init__(name=name, daemon=True)
+        self.func = func
+        self.src = src
+        self.dst = dst
+        self.timeout = timeout          # poll interval, s: how fast the stage notices a stop request
+        self.stop_event = threading.Event()
+        self.error = None               # exception that killed the stage, re-raised by the owner
+
+    def stop(self):
+        self.stop_event.set()
+
+    def put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.dst.put(item, timeout=self.timeout)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self):
+        while not self.stop_event.is_set():
+            try:
+                return self.src.get(timeout=self.timeout)
+            except queue.Empty:
+                continue
+        return STOP
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                if self.src is None:
+                    try:
+                        item = self.func()
+                    except StopIteration:
+                        self.put(STOP)
+                        break
+                else:
+                    item = self.get()
+                    if item is STOP:
+                        if self.dst is not None:
+                            self.put(STOP)
+                        break
+                    item = self.func(item)
+                if self.dst is not None and not self.put(item):
+                    break
+        except Exception as e:
+            self.error = e
+            if self.dst is not None:
+                self.put(STOP)
@@ -0,0 +1,782 @@
+from ultralytics.yolo.engine.predictor import BasePredictor
+from ultralytics.yolo.utils import DEFAULT_CFG, LOGGER, SETTINGS, callbacks, ops
+from ultralytics.yolo.utils.plotting import Annotator, colors
+from ultralytics.yolo.utils.torch_utils import smart_inference_mode, select_device
+from ultralytics.yolo.utils.files import increment_path
+from ultralytics.yolo.utils.checks import check_imshow, check_imgsz
+from ultralytics.yolo.cfg import get_cfg
+from ultralytics.yolo.data import load_inference_source
+from ultralytics.yolo.data.augment import LetterBox
+from PySide6.QtCore import Signal, QObject
+from collections import defaultdict
+from pathlib import Path
+from utils.pipeline import StageQueue, LatestQueue, StageWorker, STOP
+from utils.sources import LatestFrameSource, PrefetchFolderSource, is_image_folder, is_live_source
+from utils.control import ControlChannel
+from utils.pacing import FramePacer
+from utils.preprocess import FusedPreprocessor, raw_frame
+from utils.detections import DetectionCounts, DetectionBatch, PredictionCache
+from utils.writers import LabelWriter, ResultWriter, CropSaver
+from utils.backends import BACKENDS, PRECISIONS, calibration_frames, load_backend
+from utils.model_pool import ModelPool
+from utils.frame_slot import FrameSlot
+from utils.telemetry import Telemetry, StageLatency
+from concurrent.futures import TimeoutError as FutureTimeout
+import numpy as np
+import threading
+import queue
+import time
+import json
+import torch
+import cv2
+import os
+
+
+# Detection engine shared by the GUI (main.py, run on a QThread) and the headless CLI (detect.py).
+# Only needs QtCore: status changes leave through a signal, frames and statistics through
+# FrameSlot/Telemetry polled by the GUI, nothing here touches widgets.
+class YoloPredictor(BasePredictor, QObject):
+    yolo2main_status_msg = Signal(str)       # Detecting/pausing/stopping/testing complete/error reporting signal
+    yolo2main_labels = Signal(dict)          # Detected target results (number of each category)
+
+    def __init__(self, cfg=DEFAULT_CFG, overrides=None): 
+        super(YoloPredictor, self).__init__() 
+        QObject.__init__(self)
+
+        self.args = get_cfg(cfg, overrides)
+        project = self.args.project or Path(SETTINGS['runs_dir']) / self.args.task
+        name = f'{self.args.mode}'
+        self.save_dir = increment_path(Path(project) / name, exist_ok=self.args.exist_ok)
+        self.done_warmup = False
+        if self.args.show:
+            self.args.show = check_imshow(warn=True)
+
+        # GUI args
+        self.used_model_name = None      # The detection model name to use
+        self.new_model_name = None       # Models that change in real time
+        self.used_backend = None         # inference backend of the loaded model
+        self.backend = BACKENDS[0]       # backend requested for the next model load
+        self.used_precision = None       # precision of the loaded model
+        self.precision = PRECISIONS[0]   # 'FP32' or 'INT8 (CPU)' (quantized ONNX on ONNX Runtime)
+        self.model_pool = ModelPool(self.load_model)  # warm models for switching without a frame gap
+        self.pred_cache = PredictionCache()   # raw predictions, threshold changes only re-run NMS
+        self.cache_source = None         # source the cached predictions belong to
+        self.thresholds_changed = False  # conf/iou changed since the last NMS
+        self.running = threading.Lock()  # held by run(), idle threshold changes redraw from the GUI thread
+        self.source = ''                 # input source
+        self.control = ControlChannel()  # pause/resume/stop/model/threshold commands from the GUI
+        self.stop_dtc = False            # Termination detection
+        self.continue_dtc = True         # pause   
+        self.save_res = False            # Save test results
+        self.save_txt = False            # save label(txt) file
+        self.save_json = False           # save every frame's boxes to detections.jsonl
+        self.iou_thres = 0.45            # iou
+        self.conf_thres = 0.25           # conf
+        self.speed_thres = 10            # frame budget, ms (0: as fast as possible)
+        self.target_fps = 0              # frame rate cap, replaces speed_thres when > 0 (detect.py --fps)
+        self.pacer = FramePacer()        # sleeps only for what is left of the frame budget
+        self.labels_dict = {}            # return a dictionary of results
+        self.frames = FrameSlot()        # newest (source, result, overlay) for display, older ones are dropped
+        self.vector_overlay = True       # display boxes as a vector overlay, burn them into pixels only for save_res
+        self.display = True              # produce display frames; False while the GUI is hidden (detect/save only)
+        self.telemetry = Telemetry()     # fps, counts, progress, latencies and queue depths, read by the GUI timer
+        self.latency = StageLatency()    # rolling per-stage latency histograms (decode ... write), ms per frame
+        self.status = None               # last status text emitted
+        self.progress_value = 0          # progress bar
+        self.queue_size = 4              # frames buffered between pipeline stages
+        self.batch_size = 1              # frames stacked into one model call (video/image folder only)
+        self.latest_frame = True         # webcam/rtsp: always detect on the newest frame, drop stale ones
+        self.prefetch_workers = 4        # image folders: decode threads (0: decode on the capture stage)
+        self.prefetch = 8                # image folders: images decoded ahead of inference
+    
+
+        # Usable if setup is done
+        self.model = None
+        self.data = self.args.data  # data_dict
+        self.imgsz = None
+        self.device = None
+        self.dataset = None
+        self.vid_path, self.vid_writer = None, None
+        self.annotator = None
+        self.data_path = None
+        self.source_type = None
+        self.batch = None
+        self.preprocessor = None
+        self.label_writer = None         # background writer for save_txt
+        self.result_writer = None        # background image/video encoder for save_res
+        self.write_queue_size = 8        # frames waiting for the encoder
+        self.write_policy = 'block'      # full encoder queue: 'block', 'drop' or 'spill' to disk
+        self.crop_saver = None           # crop export pool for args.save_crop
+        self.crop_workers = 2            # threads cutting and encoding crops
+        self.workers = []                # capture/render pipeline threads
+        self.threads = 0                 # ONNX Runtime intra-op threads (0: one per physical core)
+        self.error = None                # exception that ended the last run
+        self.callbacks = defaultdict(list, callbacks.default_callbacks)  # add callbacks
+        callbacks.add_integration_callbacks(self)
+
+    # main for detect
+    @smart_inference_mode()
+    def run(self):
+        self.running.acquire()
+        try:
+            if self.args.verbose:
+                LOGGER.info('')
+            self.stop_dtc, self.continue_dtc = False, True
+            self.error = None
+            self.status = None
+            self.telemetry.reset()
+            self.latency.clear()
+            self.frames.dropped = 0
+            self.apply_commands()       # model/threshold changes made while idle
+
+            # cold start: the model loads and warms up on the model pool thread while this thread
+            # opens the source and the capture stage decodes the first frames
+            t0 = time.perf_counter()
+            self.set_status('Loding Model...')
+            start_key = self.model_key()
+            warm = self.model_pool.get(start_key) is not None
+            self.model_pool.request(start_key)
+
+            # set source
+            self.setup_source(self.source if self.source is not None else self.args.source)
+            t_source = time.perf_counter() - t0
+
+            # Check save path/label
+            if self.save_res or self.save_txt or self.save_json:
+                (self.save_dir / 'labels' if self.save_txt else self.save_dir).mkdir(parents=True, exist_ok=True)
+            if self.save_txt or self.save_json:
+                self.label_writer = LabelWriter()
+                self.label_writer.start()
+            if self.save_res:
+                self.result_writer = ResultWriter(self.write_queue_size, self.write_policy,
+                                                  latency=self.latency.histograms['write'])
+                self.result_writer.start()
+            if self.args.save_crop:
+                self.crop_saver = CropSaver(self.crop_workers)
+
+            self.seen, self.windows, self.dt, self.batch = 0, [], (ops.Profile(), ops.Profile(), ops.Profile()), None
+
+            # start detection
+            # capture (decode) -> inference (this thread) -> render (annotate/save/emit), linked by bounded queues,
+            # so decoding, the model and disk I/O overlap instead of adding up per frame
+            self.count = 0                      # run location frame
+            self.fps_count = 0                  # frame count at the last frame rate update
+            self.pending = None                 # frame read ahead while building a batch
+            self.first_frame_at = None          # perf_counter() when the capture stage decoded its first frame
+            self.pacer.reset()
+            if isinstance(self.dataset, LatestFrameSource):
+                self.capture_queue = LatestQueue('capture')     # a newer camera frame replaces a waiting one
+            else:
+                self.capture_queue = StageQueue('capture', self.queue_size)
+            self.render_queue = StageQueue('render', self.queue_size)
+            capture = StageWorker('capture', self.capture_frame, dst=self.capture_queue)
+            render = StageWorker('render', self.render_frame, src=self.render_queue)
+            self.workers = [capture, render]
+            capture.start()
+
+            # wait for the warm model, still answering stop
+            while True:
+                self.apply_commands()
+                if self.stop_dtc:
+                    self.stop_workers()
+                    self.pred_cache.clear()     # nothing to redraw on the cleared panels
+                    self.set_status('Detection terminated!')
+                    return
+                try:
+                    model = self.model_pool.load(start_key, timeout=0.1)
+                    break
+                except FutureTimeout:
+                    continue
+            self.use_model(start_key, model)
+            self.setup_preprocessor()
+            t_model = time.perf_counter() - t0
+            render.start()
+            self.start_time = time.time()       # used to calculate the frame rate
+            startup = None                      # startup phase timing, shown once the first frame is detected
+
+            while True:
+                self.check_workers()
+                self.apply_commands()
+
+                # Termination detection
+                if self.stop_dtc:
+                    self.stop_workers()         # also releases the final video writer
+                    self.pred_cache.clear()     # nothing to redraw on the cleared panels
+                    self.set_status('Detection terminated!')
+                    break
+                
+                # Change the model (or its backend/precision) midway: it loads and warms up in the
+                # background while the current one keeps detecting, then swaps in between two frames
+                key = self.model_key()
+                if key != self.used_key():
+                    model = self.model_pool.get(key)
+                    error = self.model_pool.error(key)
+                    if model is not None:
+                        self.use_model(key, model)
+                    elif error is not None:
+                        self.set_status(f'Model load failed: {error}')
+                        self.new_model_name, self.backend, self.precision = self.used_key()
+                    else:
+                        self.model_pool.request(key)
+                
+                # pause switch: sleep until the next command instead of spinning,
+                # a conf/iou change redraws the last frame from its cached prediction
+                if not self.continue_dtc:
+                    if self.thresholds_changed:
+                        self.redraw()
+                    self.control.wait()
+                    self.pacer.reset()
+                    continue
+
+                try:
+                    item = self.capture_queue.get(timeout=0.1)   # next data
+                except queue.Empty:
+                    continue
+
+                # Detection completed: let the render stage drain, then close the writer
+                if item is STOP:
+                    self.push(self.render_queue, STOP, render)
+                    render.join()
+                    self.stop_workers()
+                    self.check_workers()
+                    if isinstance(self.dataset, PrefetchFolderSource):
+                        report = self.prefetch_report()
+                        LOGGER.info(report)
+                        self.set_status('Detection completed (%s)' % report)
+                    else:
+                        self.set_status('Detection completed')
+                    break
+
+                self.set_status('Detecting...' if startup is None else 'Detecting... (%s)' % startup)
+                batch, frame, media = item
+                self.batch = batch
+                path, im, im0s, vid_cap, s = batch
+                visualize = increment_path(self.save_dir / Path(path[0] if isinstance(path, list) else path).stem,
+                                           mkdir=True) if self.args.visualize else False
+
+                # an image seen before by the same model (folder re-run after a threshold change)
+                # only needs NMS on its cached prediction
+                cached = None
+                if media[0] == 'image' and not isinstance(path, list):
+                    cached = self.pred_cache.get(self.cache_key(path, media[0]))
+                if cached is not None:
+                    preds, shape = cached[0], cached[1]
+                    im = torch.empty(shape, device='meta')      # input shape only, for scale_boxes
+                    self.cache_preds(preds, shape, im0s, path, media[0])  # newest again, with this frame for redraw
+                else:
+                    # preprocess 
+                    with self.dt[0]:
+                        im = self.preprocess(im)
+                        if len(im.shape) == 3:
+                            im = im[None]  # expand for batch dim
+                    # inference 
+                    with self.dt[1]:
+                        preds = self.model(im, augment=self.args.augment, visualize=visualize)
+                        preds = preds[0] if isinstance(preds, (list, tuple)) else preds
+                    self.cache_preds(preds, im.shape, im0s, path, media[0])
+                # postprocess 
+                with self.dt[2]:
+                    self.results = self.postprocess(preds, im, im0s)
+                    self.thresholds_changed = False
+
+                n = len(im)
+                hit = cached is not None        # no preprocess/inference ran, self.dt still holds the last frame's
+                speed = {'preprocess': 0.0 if hit else self.dt[0].dt * 1E3 / n,
+                         'inference': 0.0 if hit else self.dt[1].dt * 1E3 / n,
+                         'postprocess': self.dt[2].dt * 1E3 / n}
+                for i in range(n):
+                    self.results[i].speed = dict(speed)
+                self.telemetry.update(latency=speed)
+                if not hit:
+                    self.latency.record('preprocess', speed['preprocess'])
+                    self.latency.record('inference', speed['inference'])
+                self.latency.record('nms', speed['postprocess'])
+
+                # visualize, save, write results in the render stage
+                self.push(self.render_queue, (batch, frame, media, im, self.results), render)
+
+                if startup is None:
+                    startup = 'first detection %.2fs: model %s, source %.2fs, first frame %.2fs' % (
+                        time.perf_counter() - t0,
+                        'warm' if warm else '%.2fs (ready at %.2fs)' % (self.model_pool.load_times[start_key], t_model),
+                        t_source, self.first_frame_at - t0)
+                    LOGGER.info(f'Startup: {startup}')
+
+                # hold the frame budget, only sleeping for the time this batch did not use
+                if self.target_fps > 0:
+                    self.pacer.set_fps(self.target_fps)
+                else:
+                    self.pacer.budget = self.speed_thres / 1000
+                self.pacer.wait(n)
+
+        except Exception as e:
+            self.error = e
+            self.stop_workers()
+            print(e)
+            self.set_status('%s' % e)
+        finally:
+            self.running.release()
+
+    # capture stage: decode the next frame (or batch_size frames), raises StopIteration at the end of the source
+    # (decode latency: time spent getting each frame, including the wait for a camera or the prefetch threads)
+    def capture_frame(self):
+        t = time.perf_counter()
+        batch, frame, media = self.read_frame()
+        if self.first_frame_at is None:
+            self.first_frame_at = time.perf_counter()
+        if self.batch_size <= 1 or self.source_type.webcam:
+            self.latency.record('decode', (time.perf_counter() - t) * 1E3)
+            return batch, frame, media
+
+        # Offline sources: group up to batch_size frames from the same file into one batch,
+        # preprocess letterboxes them all to the full imgsz so they stack into one tensor
+        frames = [(batch, frame, media)]
+        while len(frames) < self.batch_size:
+            try:
+                nxt = self.read_frame()
+            except StopIteration:
+                break
+            if nxt[0][3] is not batch[3]:
+                self.pending = nxt      # starts the next batch
+                break
+            frames.append(nxt)
+        self.latency.record('decode', (time.perf_counter() - t) * 1E3 / len(frames))
+        if len(frames) == 1:
+            return batch, frame, media
+        paths, ims, im0s, vid_cap, s = zip(*[b for b, _, _ in frames])
+        return (list(paths), list(ims), list(im0s), vid_cap[0], list(s)), [f for _, f, _ in frames], media
+
+    def read_frame(self):
+        if self.pending is not None:
+            nxt, self.pending = self.pending, None
+            return nxt
+        batch = next(self.dataset)
+        if self.source_type.webcam or self.source_type.from_img:
+            frame = self.dataset.count
+        else:
+            frame = getattr(self.dataset, 'frame', 0)
+        return batch, frame, self.media_info(batch[3])
+
+    # (mode, total frames, fps, (w, h)) of the frame just decoded, read on the capture thread: the
+    # later stages run behind it, and a dataset releases a video's capture (and moves on to the
+    # next file) while frames of that video are still queued. Total 0 and size None when not a video.
+    def media_info(self, vid_cap):
+        if not vid_cap:
+            return self.dataset.mode, 0, 30, None
+        return (self.dataset.mode,
+                int(vid_cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+                int(vid_cap.get(cv2.CAP_PROP_FPS)) or 30,    # integer required, floats produce error in MP4 codec
+                (int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))
+
+    # render stage: annotate, save and send the results of one inferred batch
+    @smart_inference_mode()
+    def render_frame(self, item):
+        batch, frame, media, im, results = item
+        path, _, im0s, vid_cap, s = batch
+        mode, total, _, size = media
+
+        n = len(im)
+
+        # Calculation completion and frame rate (to be optimized)
+        self.count += n              # frame count +n
+        all_count = total if size is not None else 1   # total frames of a video (0 when unknown)
+        self.progress_value = int(self.count/all_count*1000) if all_count > 0 else 0   # progress bar(0~1000)
+        stats = {'progress': self.progress_value}
+        if self.count - self.fps_count >= 5:                    # Calculate the frame rate every 5 frames
+            fps = str(int((self.count - self.fps_count)/(time.time()-self.start_time)))
+            if isinstance(self.dataset, LatestFrameSource):
+                fps += f' (-{self.dataset.dropped + self.capture_queue.dropped})'   # dropped to keep up with the camera
+            stats.update(fps=fps, queues=self.queue_status())
+            self.fps_count = self.count
+            self.start_time = time.time()
+
+        display = self.display               # read once, the GUI may change it mid-batch
+        pixels = self.save_res or (display and not self.vector_overlay)   # annotate a copy of the frame in pixel space
+        for i in range(n):
+            p, im0 = (path[i], im0s[i]) if isinstance(im0s, list) else (path, im0s)
+            if pixels:
+                im0 = im0.copy()
+            p = Path(p)     # the source dir
+
+            # must, to get boxs\labels and the per-class counts
+            t = time.perf_counter()
+            counts = self.write_results(i, results, (p, im, im0), frame[i] if isinstance(frame, list) else frame,
+                                        pixels, mode)
+            overlay = self.overlay(results[i]) if display and not pixels else None
+            self.latency.record('annotation', (time.perf_counter() - t) * 1E3)
+            self.labels_dict = counts.labels
+
+            # save img or video result
+            if self.save_res:
+                stream = i if self.source_type.webcam else 0     # frames of a batched video share one writer
+                self.save_preds(media, stream, str(self.save_dir / p.name))
+
+            # Send test results: (before testing, after detection, vector overlay or None),
+            # the GUI shows the newest on its timer; nothing is built for a hidden window
+            if display:
+                self.frames.publish((im0s[i] if isinstance(im0s, list) else im0s, im0, overlay))
+            stats['counts'] = counts
+            # self.yolo2main_labels.emit(self.labels_dict)        # webcam need to change the def write_results
+
+        self.telemetry.update(**stats)      # one snapshot update per batch, read by the GUI at its own rate
+
+    # Status text for the GUI/CLI, emitted only when it changes
+    def set_status(self, msg):
+        if msg != self.status:
+            self.status = msg
+            self.yolo2main_status_msg.emit(msg)
+
+    # Apply the commands queued by the GUI since the last frame
+    def apply_commands(self):
+        for cmd, value in self.control.take():
+            if cmd == 'pause':
+                self.continue_dtc = False
+            elif cmd == 'resume':
+                self.continue_dtc = True
+            elif cmd == 'stop':
+                self.stop_dtc = True
+            elif cmd == 'model':
+                self.new_model_name = value
+            elif cmd == 'backend':
+                self.backend = value
+            elif cmd == 'precision':
+                self.precision = value
+            elif cmd == 'iou':
+                self.iou_thres = value
+                self.thresholds_changed = True
+            elif cmd == 'conf':
+                self.conf_thres = value
+                self.thresholds_changed = True
+        if isinstance(self.dataset, LatestFrameSource):
+            self.dataset.paused = not self.continue_dtc
+
+    # Hand an item to the next stage, giving up if that stage died or detection was terminated
+    def push(self, q, item, worker):
+        while worker.is_alive():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                if self.stop_dtc:
+                    break
+        return False
+
+    # Re-raise an exception that ended one of the pipeline stages
+    def check_workers(self):
+        for worker in self.workers:
+            if worker.error is not None:
+                raise worker.error
+
+    def stop_workers(self):
+        for worker in self.workers:
+            worker.stop()
+        if isinstance(self.dataset, (LatestFrameSource, PrefetchFolderSource)):
+            self.dataset.close()        # wakes a capture stage waiting for the next camera frame, drops prefetched images
+        for worker in self.workers:
+            if worker.ident is not None and worker is not threading.current_thread():     # started
+                worker.join(timeout=1)
+        self.workers = []
+        if self.label_writer is not None:
+            self.label_writer.close()   # flush the labels still queued
+            if self.label_writer.error is not None:
+                LOGGER.warning(f'Label writer: {self.label_writer.error}')
+            self.label_writer = None
+        if self.result_writer is not None:
+            self.result_writer.close()  # encode what is still queued, release the final video writer
+            if self.result_writer.error is not None:
+                LOGGER.warning(f'Result writer: {self.result_writer.error}')
+            self.result_writer = None
+        if self.crop_saver is not None:
+            self.crop_saver.close()     # wait for the crops still being written
+            if self.crop_saver.error is not None:
+                LOGGER.warning(f'Crop saver: {self.crop_saver.error}')
+            self.crop_saver = None
+
+    # Current depth of every inter-stage queue, e.g. "capture 2/4  render 0/4"
+    def queue_status(self):
+        queues = [self.capture_queue, self.render_queue]
+        if self.label_writer is not None:
+            queues.append(self.label_writer.queue)
+        status = '  '.join(f'{q.name} {q.depth}/{q.maxsize or "-"} (peak {q.peak})' for q in queues)
+        if self.result_writer is not None:
+            status += f'  writer {self.result_writer.queue.depth}/{self.result_writer.queue.maxsize}' \
+                      f' (dropped {self.result_writer.dropped}, spilled {len(self.result_writer.spilled)}' \
+                      f' of {self.result_writer.spills})'
+        if self.crop_saver is not None:
+            status += f'  crops {self.crop_saver.pending}/{self.crop_saver.maxsize}'
+        if isinstance(self.dataset, PrefetchFolderSource):
+            status = f'prefetch {self.dataset.depth}/{self.dataset.prefetch}  ' + status
+        return status
+
+    # Performance panel text: rolling p50/p95/p99 per stage, queue depths and dropped frames
+    def performance(self):
+        lines = ['%-10s%6s%6s%6s' % ('ms', 'p50', 'p95', 'p99')]
+        for stage, (_, p) in self.latency.summary().items():
+            lines.append('%-10s%6.1f%6.1f%6.1f' % (stage, *p))
+        label_writer, result_writer, dataset = self.label_writer, self.result_writer, self.dataset
+        queues = [getattr(self, 'capture_queue', None), getattr(self, 'render_queue', None)] if self.workers else []
+        queues += [w.queue for w in (label_writer, result_writer) if w is not None]
+        depths = [f'{q.name} {q.depth}/{q.maxsize or "-"}' for q in queues if q is not None]
+        if isinstance(dataset, PrefetchFolderSource):
+            depths.insert(0, f'prefetch {dataset.depth}/{dataset.prefetch}')
+        lines.append('queues  ' + (', '.join(depths) or '-'))
+        dropped = [f'display {self.frames.dropped}']
+        if isinstance(dataset, LatestFrameSource):
+            capture = getattr(self, 'capture_queue', None)
+            dropped.insert(0, f'camera {dataset.dropped + getattr(capture, "dropped", 0)}')
+        if result_writer is not None:
+            dropped.append(f'writer {result_writer.dropped}')
+        lines.append('dropped ' + ', '.join(dropped))
+        if result_writer is not None and result_writer.spills:
+            lines.append(f'spilled {len(result_writer.spilled)} waiting, {result_writer.spills} total')
+        return '\n'.join(lines)
+
+    # Decode vs inference time of a prefetched folder
+    def prefetch_report(self):
+        n = max(self.dataset.count, 1)
+        return 'decode %.1f ms/img on %d threads (inference waited %.1f ms/img), inference %.1f ms/img' % (
+            self.dataset.decode_time / n * 1E3, self.dataset.workers,
+            self.dataset.wait_time / n * 1E3, self.dt[1].t / max(self.seen, 1) * 1E3)
+
+    # (weights, backend, precision) requested by the GUI and of the model detecting right now
+    def model_key(self):
+        return self.new_model_name or self.args.model, self.backend, self.precision
+
+    def used_key(self):
+        return self.used_model_name, self.used_backend, self.used_precision
+
+    # Take the model from the pool, loading it here if it is not warm yet
+    def setup_model(self, model):
+        key = (model or self.args.model, self.backend, self.precision)
+        self.use_model(key, self.model_pool.load(key))
+
+    def use_model(self, key, model):
+        self.model = model
+        self.device = model.device
+        self.used_model_name, self.used_backend, self.used_precision = key
+        self.model_pool.use(key)
+        self.done_warmup = True
+        if self.preprocessor is not None and self.dataset is not None:
+            self.setup_preprocessor()   # letterbox mode depends on the backend
+
+    # Load the model through the selected backend (PyTorch or an ONNX Runtime export cached next to it)
+    # and warm it up. Runs on the model pool thread for switches during detection.
+    # INT8 quantizes that export once; file/folder sources provide the calibration frames,
+    # cameras and streams (already opened by the detection) fall back to dynamic quantization.
+    def load_model(self, key, verbose=True):
+        weights, backend, precision = key
+        device = select_device(self.args.device, verbose=verbose)
+        self.args.half &= device.type != 'cpu'  # half precision only supported on CUDA
+        source = self.source or self.args.source
+        calibration = None
+        if source and not is_live_source(source):
+            calibration = lambda: calibration_frames(source, imgsz=self.args.imgsz)
+        model = load_backend(weights,
+                             backend=backend,
+                             device=device,
+                             imgsz=self.args.imgsz,
+                             half=self.args.half,
+                             dnn=self.args.dnn,
+                             data=self.args.data,
+                             precision=precision,
+                             calibration=calibration,
+                             threads=self.threads,
+                             verbose=verbose)
+        model.eval()
+        imgsz = check_imgsz(self.args.imgsz, stride=model.stride, min_dim=2)
+        bs = self.dataset.bs if self.dataset is not None else 1
+        model.warmup(imgsz=(1 if model.pt or model.triton else bs, 3, *imgsz))
+        return model
+
+    # Datasets yield raw BGR frames, letterboxing happens in the fused preprocess
+    # Does not need the model (it may still be loading), frames are letterboxed by setup_preprocessor
+    def setup_source(self, source):
+        if source != self.cache_source:     # re-running the same source keeps its cached predictions
+            self.pred_cache.clear()
+            self.cache_source = source
+        if self.latest_frame and is_live_source(source):
+            self.dataset = LatestFrameSource(source, vid_stride=self.args.vid_stride)
+        elif self.prefetch_workers and is_image_folder(source):     # folders with videos: LoadImages
+            self.dataset = PrefetchFolderSource(source, workers=self.prefetch_workers, prefetch=self.prefetch)
+        else:
+            self.dataset = load_inference_source(source=source,
+                                                 transforms=raw_frame,
+                                                 imgsz=self.args.imgsz,
+                                                 vid_stride=self.args.vid_stride)
+        self.source_type = self.dataset.source_type
+        self.vid_path, self.vid_writer = [None] * self.dataset.bs, [None] * self.dataset.bs
+        iter(self.dataset)      # datasets set up their counters in __iter__
+
+    # minimum-rectangle letterbox only when every model call holds a single frame
+    def setup_preprocessor(self):
+        self.imgsz = check_imgsz(self.args.imgsz, stride=self.model.stride, min_dim=2)  # check image size
+        auto = self.model.pt and self.batch_size == 1 and self.dataset.bs == 1
+        self.preprocessor = FusedPreprocessor(self.imgsz, stride=self.model.stride, auto=auto)
+        if isinstance(self.dataset, PrefetchFolderSource):
+            # letterbox in the prefetch threads, the preprocessor then only converts the padded image
+            self.dataset.letterbox = LetterBox(self.imgsz, auto=auto, stride=self.model.stride)
+
+    # Hand the annotated frame to the result writer instead of encoding it on the render thread
+    # (media: media_info() of the frame, taken when it was decoded)
+    def save_preds(self, media, idx, save_path):
+        im0 = self.annotator.result()
+        mode, _, fps, size = media
+        if mode == 'image':
+            self.result_writer.write(save_path, im0)
+            return
+        if size is None:  # stream
+            size = im0.shape[1], im0.shape[0]
+        self.result_writer.write(str(Path(save_path).with_suffix('.mp4')), im0, fps=fps, size=size, key=idx)
+
+    def get_annotator(self, img, names=None):
+        return Annotator(img, line_width=self.args.line_thickness, example=str(names or self.model.names))
+
+    # BGR frame(s) -> letterboxed RGB 0.0-1.0 NCHW tensor, written into a reused input buffer
+    def preprocess(self, img):
+        return self.preprocessor(img, self.model.device, half=self.model.fp16)
+
+    def nms(self, preds):
+        return ops.non_max_suppression(preds,
+                                       self.conf_thres,
+                                       self.iou_thres,
+                                       agnostic=self.args.agnostic_nms,
+                                       max_det=self.args.max_det,
+                                       classes=self.args.classes)
+
+    def postprocess(self, preds, img, orig_img):
+        ### important
+        preds = self.nms(preds)
+
+        results = []
+        path, _, _, _, _ = self.batch
+        for i, pred in enumerate(preds):
+            orig = orig_img[i] if isinstance(orig_img, list) else orig_img     # one entry per frame of the batch
+            shape = orig.shape
+            pred[:, :4] = ops.scale_boxes(img.shape[2:], pred[:, :4], shape).round()
+            img_path = path[i] if isinstance(path, list) else path
+            results.append(DetectionBatch.from_pred(pred, orig, img_path, self.model.names))  # Results on demand
+        # print(results)
+        return results
+
+    # Keep the raw output of every frame of the batch (views, nothing is copied)
+    def cache_preds(self, preds, shape, orig_img, path, mode):
+        keep = mode == 'image'
+        for i in range(len(preds)):
+            orig = orig_img[i] if isinstance(orig_img, list) else orig_img
+            img_path = path[i] if isinstance(path, list) else path
+            self.pred_cache.put(self.cache_key(img_path, mode),
+                                (preds[i:i + 1], (1, *shape[1:]), orig, img_path, self.model.names), keep)
+
+    # Same model, same file, not modified since (a replaced image is detected again)
+    def cache_key(self, path, mode):
+        mtime = None
+        if mode == 'image':
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                pass
+        return self.used_key(), path, mtime
+
+    # Re-run NMS with the current thresholds on the last cached frame and show it again (nothing is saved)
+    def redraw(self):
+        self.thresholds_changed = False
+        entry = self.pred_cache.last()
+        if entry is None:
+            return
+        pred, shape, orig, path, names = entry
+        pred = self.nms(pred)[0]
+        pred[:, :4] = ops.scale_boxes(shape[2:], pred[:, :4], orig.shape).round()
+        det = DetectionBatch.from_pred(pred, orig, path, names)
+        counts = det.counts()
+        self.labels_dict = counts.labels
+        self.telemetry.update(counts=counts)
+        if self.vector_overlay:
+            self.frames.publish((orig, orig, self.overlay(det)))
+            return
+        annotator = self.get_annotator(orig.copy(), names)
+        self.draw_detections(annotator, det)
+        self.frames.publish((orig, annotator.result(), None))
+
+    # Threshold change from the GUI thread: applied right away if no detection is running
+    # (the detection loop handles it otherwise, redrawing itself while paused)
+    @smart_inference_mode()
+    def redraw_idle(self):
+        if not self.running.acquire(blocking=False):
+            return
+        try:
+            self.apply_commands()
+            if self.thresholds_changed and self.source == self.cache_source:   # not a frame of another source
+                self.redraw()
+            self.thresholds_changed = False
+        finally:
+            self.running.release()
+
+    # Label text of every box (None with hide_labels)
+    def box_labels(self, det):
+        confs, classes = det.conf.tolist(), det.cls.tolist()
+        ids = det.id.tolist() if det.id is not None else None
+        labels = []
+        for j in range(len(det)):
+            c, conf = classes[j], confs[j]  # integer class
+            name = f'id:{ids[j]} {det.names[c]}' if ids is not None else det.names[c]
+            labels.append(None if self.args.hide_labels else (name if self.args.hide_conf else f'{name} {conf:.2f}'))
+        return labels
+
+    def draw_detections(self, annotator, det):
+        boxes, classes, labels = det.xyxy.tolist(), det.cls.tolist(), self.box_labels(det)
+        for j in reversed(range(len(det))):
+            annotator.box_label(boxes[j], labels[j], color=colors(classes[j], True))
+
+    # (xyxy (n, 4) in frame pixels, labels, RGB colors) painted by FrameView over the frame
+    def overlay(self, det):
+        return det.xyxy, self.box_labels(det), [colors(c) for c in det.cls.tolist()]
+
+    # Annotate/save one frame, returns its DetectionCounts
+    # (pixels: draw the boxes into im0, which must then be a copy of the source frame;
+    #  mode: dataset mode when the frame was decoded, the dataset itself may be ahead)
+    def write_results(self, idx, results, batch, frame=0, pixels=None, mode=None):
+        p, im, im0 = batch
+        if len(im.shape) == 3:
+            im = im[None]  # expand for batch dim
+        self.seen += 1
+        self.data_path = p
+        image = (mode or self.dataset.mode) == 'image'
+        stem = p.stem + ('' if image else f'_{frame}')
+        # images: one YOLO label file each; videos/streams: one file per source, each line prefixed with the frame
+        self.txt_path = str(self.save_dir / 'labels' / p.stem)
+        # log_string += '%gx%g ' % im.shape[2:]         # !!! don't add img size~
+        if pixels is None:
+            pixels = self.save_res or not self.vector_overlay
+        self.annotator = self.get_annotator(im0) if pixels else None     # vector overlay: frame left untouched
+
+        det = results[idx]     # DetectionBatch
+        if self.save_json and self.label_writer is not None:  # one line per frame, frames without detections included
+            record = {'path': str(p), 'frame': frame, 'shape': list(det.orig_shape),
+                      'boxes': np.round(det.data(), 2).tolist(), 'names': [det.names[c] for c in det.cls.tolist()]}
+            self.label_writer.write(str(self.save_dir / 'detections.jsonl'), [json.dumps(record) + '\n'])
+
+        if len(det) == 0:
+            return DetectionCounts()
+
+        counts = det.counts()     # detections per class
+
+        # write, one host-side list per column instead of per-box tensor calls
+        lines = []
+        if self.save_txt:  # collect, the label writer appends the whole frame at once
+            confs, classes, xywhn = det.conf.tolist(), det.cls.tolist(), det.xywhn.tolist()
+            for j in reversed(range(len(det))):
+                c, conf = classes[j], confs[j]  # integer class
+                line = (c, *xywhn[j], conf) if self.args.save_conf else (c, *xywhn[j])  # label format
+                if not image:
+                    line = (frame, *line)
+                lines.append(('%g ' * len(line)).rstrip() % line + '\n')
+        if self.annotator is not None:
+            self.draw_detections(self.annotator, det)     # Add bbox to image
+        if self.crop_saver is not None:
+            # crops are cut from the unannotated source frame, no copy needed;
+            # named per frame so frames exported in parallel never race for the same file name
+            self.crop_saver.submit(det.orig_img, det.xyxy[::-1], det.cls[::-1], self.model.names, self.save_dir, stem)
+        if self.save_txt and self.label_writer is not None:
+            self.label_writer.write(f'{self.txt_path}.txt', lines)
+
+        return counts
@@ -0,0 +1,83 @@
+import numpy as np
+import torch
+import cv2
+
+
+# Dataset transform that hands the decoded BGR frame through untouched,
+# letterboxing is left to FusedPreprocessor
+def raw_frame(im):
+    return im
+
+
+# Letterbox + BGR->RGB + HWC->CHW + uint8->float + /255 for a list of BGR frames.
+# The resize writes into a buffer kept per input size and the rest happens in a single
+# strided pass per channel into a model input tensor that is reused for the same shape,
+# so no full-size temporaries are allocated per frame.
+# The geometry matches ultralytics' LetterBox, so ops.scale_boxes maps boxes back unchanged.
+class FusedPreprocessor:
+    def __init__(self, imgsz, stride=32, auto=False, pad=114, max_cached=16):
+        self.imgsz = (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+        self.stride = stride
+        self.auto = auto                # minimum rectangle (pad to stride) instead of the full imgsz
+        self.pad = pad
+        self.max_cached = max_cached    # distinct frame sizes to keep buffers for
+        self.geometries = {}            # (h0, w0) -> ((h, w), (H, W), (top, left))
+        self.resized = {}               # (h0, w0) -> uint8 HWC resize buffer
+        self.inputs = {}                # (n, H, W, dtype, device) -> [input tensor, placed roi per image]
+
+    # Size of the resized image, size of the padded canvas and where the image sits on it
+    def geometry(self, h0, w0):
+        geo = self.geometries.get((h0, w0))
+        if geo is None:
+            r = min(self.imgsz[0] / h0, self.imgsz[1] / w0)
+            h, w = int(round(h0 * r)), int(round(w0 * r))
+            dh, dw = self.imgsz[0] - h, self.imgsz[1] - w
+            if self.auto:
+                dh, dw = np.mod(dh, self.stride), np.mod(dw, self.stride)
+            dh, dw = dh / 2, dw / 2
+            top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+            left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+            geo = (h, w), (h + top + bottom, w + left + right), (top, left)
+            if len(self.geometries) >= self.max_cached:
+                self.geometries.clear()
+            self.geometries[(h0, w0)] = geo
+        return geo
+
+    # Resize a BGR frame to its letterbox size, into a reused buffer
+    def resize(self, im0):
+        (h, w), _, _ = self.geometry(*im0.shape[:2])
+        if (h, w) == im0.shape[:2]:
+            return im0
+        buf = self.resized.get(im0.shape[:2])
+        if buf is None:
+            if len(self.resized) >= self.max_cached:
+                self.resized.clear()
+            buf = self.resized[im0.shape[:2]] = np.empty((h, w, 3), dtype=np.uint8)
+        return cv2.resize(im0, (w, h), dst=buf, interpolation=cv2.INTER_LINEAR)
+
+    # frames: HWC BGR uint8 image, NHWC array or list of images -> NCHW RGB float tensor on device
+    def __call__(self, frames, device, half=False):
+        if isinstance(frames, np.ndarray) and frames.ndim == 3:
+            frames = [frames]
+        geos = [self.geometry(*f.shape[:2]) for f in frames]
+        H = max(g[1][0] for g in geos)
+        W = max(g[1][1] for g in geos)
+        dtype = torch.float16 if half else torch.float32
+        key = (len(geos), H, W, dtype, str(device))
+        entry = self.inputs.get(key)
+        if entry is None:
+            if len(self.inputs) >= self.max_cached:
+                self.inputs.clear()
+            entry = self.inputs[key] = [torch.empty((len(geos), 3, H, W), dtype=dtype, device=device),
+                                        [None] * len(geos)]
+        x, placed = entry
+
+        for i, (f, ((h, w), _, (top, left))) in enumerate(zip(frames, geos)):
+            if placed[i] != (top, left, h, w):     # padding only needs refilling when the image moves
+                x[i].fill_(self.pad / 255)
+                placed[i] = (top, left, h, w)
+            src = torch.from_numpy(self.resize(f)).to(device, non_blocking=True)
+            dst = x[i, :, top:top + h, left:left + w]
+            for c in range(3):
+                torch.mul(src[..., 2 - c], 1 / 255, out=dst[c])    # BGR->RGB, HWC->CHW, /255 in one pass
+        return x
@@ -0,0 +1,189 @@
+from ultralytics.yolo.data.dataloaders.stream_loaders import SourceTypes
+from ultralytics.yolo.data.utils import IMG_FORMATS, VID_FORMATS
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from pathlib import Path
+import threading
+import time
+import cv2
+import os
+
+
+# Webcam index ('0') or network stream (rtsp/rtmp/http without a media file suffix)
+def is_live_source(source):
+    source = str(source)
+    if source.isnumeric():
+        return True
+    if source.lower().startswith(('rtsp://', 'rtmp://')):
+        return True
+    return source.lower().startswith(('http://', 'https://')) \
+        and Path(source).suffix[1:].lower() not in (IMG_FORMATS + VID_FORMATS)
+
+
+# Directory holding images and no videos (a folder with videos goes through LoadImages, which reads both)
+def is_image_folder(source):
+    if not os.path.isdir(str(source)):
+        return False
+    suffixes = {f.suffix[1:].lower() for f in Path(source).iterdir()}
+    return bool(suffixes & set(IMG_FORMATS)) and not suffixes & set(VID_FORMATS)
+
+
+# Live source where a grabber thread per stream keeps only the newest decoded frame.
+# Iterating always returns the most recent frames, so latency stays bounded when inference
+# is slower than the camera; frames that were overwritten before being used are counted in `dropped`.
+# Yields (path, im, im0s, vid_cap, s) tuples like ultralytics' LoadStreams, with `im` being the raw
+# BGR frames (letterboxing is done by FusedPreprocessor).
+class LatestFrameSource:
+    def __init__(self, sources, vid_stride=1, timeout=10):
+        sources = [sources] if isinstance(sources, (str, int)) else list(sources)
+        self.sources = [str(x) for x in sources]
+        self.mode = 'stream'
+        self.bs = len(self.sources)
+        self.vid_stride = vid_stride    # decode every vid_stride-th frame
+        self.timeout = timeout          # s without a new frame before the stream is considered lost
+        self.source_type = SourceTypes(webcam=True)
+        self.count = 0                  # frames handed to inference
+        self.dropped = 0                # frames decoded but replaced by a newer one before inference
+        self.running = True
+        self.paused = False             # only grab (keep the stream drained) without decoding
+        self.cond = threading.Condition()
+        self.caps, self.frames, self.fresh, self.alive, self.threads = [], [], [], [], []
+
+        for i, s in enumerate(self.sources):
+            cap = cv2.VideoCapture(int(s) if s.isnumeric() else s)
+            if not cap.isOpened():
+                self.close()
+                raise ConnectionError(f'Failed to open {s}')
+            ok, im = cap.read()     # guarantee first frame
+            if not ok or im is None:
+                cap.release()
+                self.close()
+                raise ConnectionError(f'Failed to read images from {s}')
+            self.caps.append(cap)
+            self.frames.append(im)
+            self.fresh.append(True)
+            self.alive.append(True)
+        for i, cap in enumerate(self.caps):
+            thread = threading.Thread(target=self.update, args=(i, cap), daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    # Grabber thread: decode as fast as the stream delivers, overwrite the previous frame
+    def update(self, i, cap):
+        n = 0
+        while self.running and cap.isOpened():
+            n += 1
+            if not cap.grab():
+                break
+            if n % self.vid_stride or self.paused:
+                continue
+            ok, im = cap.retrieve()
+            if not ok:
+                break
+            with self.cond:
+                if self.fresh[i]:
+                    self.dropped += 1
+                self.frames[i] = im
+                self.fresh[i] = True
+                self.cond.notify_all()
+        with self.cond:
+            self.alive[i] = False
+            self.cond.notify_all()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.cond:
+            # wait for at least one frame that inference has not seen yet (no timeout while paused)
+            while not (any(self.fresh) or not self.running or not all(self.alive)):
+                if not self.cond.wait(timeout=self.timeout) and not self.paused:
+                    raise StopIteration
+            if not self.running or not all(self.alive):
+                raise StopIteration
+            im0 = list(self.frames)
+            self.fresh = [False] * self.bs
+        self.count += 1
+        return self.sources, im0, im0, None, ''
+
+    def __len__(self):
+        return len(self.sources)
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=1)
+        for cap in self.caps:
+            cap.release()
+
+
+# Image folder source whose files are decoded (and letterboxed, once `letterbox` is set) by a thread
+# pool up to `prefetch` images ahead of inference; cv2 releases the GIL while decoding and resizing.
+# Files are read in name order like LoadImages. decode_time sums the work done by the pool,
+# wait_time the time the consumer actually had to wait for it.
+# Yields (path, im, im0, None, s) like ultralytics' LoadImages.
+class PrefetchFolderSource:
+    def __init__(self, path, workers=4, prefetch=8):
+        files = [str(f) for f in sorted(Path(path).iterdir()) if f.suffix[1:].lower() in IMG_FORMATS]
+        assert files, f'No images found in {path}'
+        self.files = files
+        self.nf = len(files)
+        self.mode = 'image'
+        self.bs = 1
+        self.source_type = SourceTypes()
+        self.workers = workers
+        self.prefetch = max(prefetch, workers)
+        self.letterbox = None           # ultralytics LetterBox applied in the pool, raw frames while None
+        self.count = 0                  # images handed to inference
+        self.decode_time = 0.0          # s spent decoding/letterboxing, summed over the pool threads
+        self.wait_time = 0.0            # s the consumer waited for a decoded image
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self.futures = deque()
+        self.submitted = 0
+
+    def load(self, file):
+        t = time.perf_counter()
+        im0 = cv2.imread(file)  # BGR
+        assert im0 is not None, f'Image Not Found {file}'
+        letterbox = self.letterbox
+        im = letterbox(image=im0) if letterbox is not None else im0
+        return im, im0, time.perf_counter() - t
+
+    def fill(self):
+        while self.submitted < self.nf and len(self.futures) < self.prefetch:
+            self.futures.append(self.pool.submit(self.load, self.files[self.submitted]))
+            self.submitted += 1
+
+    @property
+    def depth(self):
+        return sum(f.done() for f in self.futures)
+
+    def __iter__(self):
+        self.count = 0
+        self.fill()
+        return self
+
+    def __next__(self):
+        if self.count == self.nf:
+            raise StopIteration
+        self.fill()
+        future = self.futures.popleft()
+        t = time.perf_counter()
+        im, im0, dt = future.result()
+        self.wait_time += time.perf_counter() - t
+        self.decode_time += dt
+        self.fill()
+        file = self.files[self.count]
+        self.count += 1
+        return file, im, im0, None, f'image {self.count}/{self.nf} {file}: '
+
+    def __len__(self):
+        return self.nf
+
+    def close(self):
+        for future in self.futures:
+            future.cancel()
+        self.futures.clear()
+        self.pool.shutdown(wait=False)
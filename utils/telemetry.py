@@ -0,0 +1,114 @@
+import threading
+import math
+import time
+
+
+# Detection statistics published by the pipeline threads and read by the GUI on a fixed tick.
+# Writers merge their fields into one snapshot under a lock instead of emitting a signal per value
+# per frame; the GUI copies the snapshot at its own rate, so a high frame rate never turns into a
+# flood of queued Qt events and text updates.
+class Telemetry:
+    DEFAULTS = {
+        'fps': None,                    # frame rate text, None before the first measurement
+        'counts': None,                 # DetectionCounts of the newest frame (per-class labels, class/target num)
+        'progress': 0,                  # 0~1000
+        'latency': {},                  # stage -> ms per frame of the newest batch
+        'queues': '',                   # inter-stage queue depths
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = dict(self.DEFAULTS)
+        self.seq = 0                    # updates so far, readers skip a snapshot they already have
+
+    def update(self, **fields):
+        with self.lock:
+            self.values.update(fields)
+            self.seq += 1
+
+    # (seq, copy of the values), None if nothing changed since `seq`
+    def snapshot(self, seq=None):
+        with self.lock:
+            if seq == self.seq:
+                return None
+            return self.seq, dict(self.values)
+
+    def reset(self):
+        self.update(**self.DEFAULTS)
+
+
+STAGES = ('decode', 'preprocess', 'inference', 'nms', 'annotation', 'display', 'write')
+
+
+# Rolling latency distribution in log-spaced buckets (8 per doubling, ~9% wide, 10 us to ~40 s).
+# record() is one log2 and one counter increment; counts live in `slices` sub-windows that are
+# recycled as time passes, so percentiles cover roughly the last `window` seconds.
+class LatencyHistogram:
+    BASE = 1E-2     # ms, upper edge of bucket 0
+    STEPS = 8       # buckets per doubling
+    SIZE = 177
+
+    def __init__(self, window=10.0, slices=5):
+        self.lock = threading.Lock()
+        self.slice_time = window / slices
+        self.slices = [[0] * self.SIZE for _ in range(slices)]
+        self.current = 0
+        self.started = time.monotonic()     # start of the current slice
+
+    def record(self, ms):
+        i = 0 if ms <= self.BASE else min(int(math.log2(ms / self.BASE) * self.STEPS) + 1, self.SIZE - 1)
+        with self.lock:
+            self.rotate()
+            self.slices[self.current][i] += 1
+
+    # Called with the lock held: clear the slices that fell out of the window
+    def rotate(self):
+        elapsed = int((time.monotonic() - self.started) / self.slice_time)
+        if elapsed:
+            for _ in range(min(elapsed, len(self.slices))):
+                self.current = (self.current + 1) % len(self.slices)
+                self.slices[self.current] = [0] * self.SIZE
+            self.started += elapsed * self.slice_time
+
+    # (samples, [latency in ms at each percentile]) over the window, bucket midpoints; None when empty
+    def percentiles(self, qs=(50, 95, 99)):
+        with self.lock:
+            self.rotate()
+            counts = [sum(c) for c in zip(*self.slices)]
+        total = sum(counts)
+        if total == 0:
+            return None
+        values, seen, q = [], 0, 0
+        for i, c in enumerate(counts):
+            seen += c
+            while q < len(qs) and seen >= qs[q] / 100 * total:
+                values.append(self.BASE * 2 ** ((i - 0.5) / self.STEPS) if i else self.BASE)
+                q += 1
+        return total, values
+
+    def clear(self):
+        with self.lock:
+            self.slices = [[0] * self.SIZE for _ in self.slices]
+            self.started = time.monotonic()
+
+
+# One LatencyHistogram per pipeline stage, recorded from whichever thread runs the stage
+class StageLatency:
+    def __init__(self, stages=STAGES, window=10.0):
+        self.histograms = {stage: LatencyHistogram(window) for stage in stages}
+
+    def record(self, stage, ms):
+        self.histograms[stage].record(ms)
+
+    # stage -> (samples, [p50, p95, p99]) for the stages with samples in the window
+    def summary(self, qs=(50, 95, 99)):
+        stats = {}
+        for stage, histogram in self.histograms.items():
+            p = histogram.percentiles(qs)
+            if p is not None:
+                stats[stage] = p
+        return stats
+
+    def clear(self):
+        for histogram in self.histograms.values():
+            histogram.clear()
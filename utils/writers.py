@@ -0,0 +1,239 @@
+from ultralytics.yolo.utils.plotting import save_one_box
+from utils.pipeline import StageQueue, STOP
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import numpy as np
+import threading
+import tempfile
+import shutil
+import queue
+import torch
+import time
+import cv2
+import os
+
+
+# Background writer for YOLO label files.
+# The render stage hands over all lines of a frame at once; the writer drains whatever is queued,
+# groups it per file and appends each file with a single write, so disk latency never reaches
+# the detection threads. close() flushes everything still queued.
+class LabelWriter(threading.Thread):
+    def __init__(self):
+        super(LabelWriter, self).__init__(name='label-writer', daemon=True)
+        self.queue = StageQueue('labels', maxsize=0)    # text only, never blocks the producer
+        self.error = None                               # last OSError, reported by the owner
+
+    def write(self, path, lines):
+        if lines:
+            self.queue.put((path, lines))
+
+    def run(self):
+        done = False
+        while not done:
+            items = [self.queue.get()]
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            grouped = {}
+            for item in items:
+                if item is STOP:
+                    done = True
+                    continue
+                path, lines = item
+                grouped.setdefault(path, []).extend(lines)
+            for path, lines in grouped.items():
+                try:
+                    with open(path, 'a') as f:
+                        f.write(''.join(lines))
+                except OSError as e:
+                    self.error = e
+
+    def close(self):
+        self.queue.put(STOP)
+        self.join()
+
+
+# Background encoder for save_res: images go through cv2.imwrite, video frames through one
+# cv2.VideoWriter per stream, all on this thread instead of the render stage.
+# When the bounded queue is full the producer's policy decides what happens:
+#   'block' - wait for room (nothing lost, a slow disk eventually throttles detection)
+#   'drop'  - discard the frame and count it
+#   'spill' - park the frame in an overflow list that a spill thread moves to .npy files in a temp
+#             dir, encoded in order once the queue has drained. The producer only appends; it waits
+#             when `maxsize` overflow frames are still in memory, i.e. when the disk is behind too.
+class ResultWriter(threading.Thread):
+    POLICIES = ('block', 'drop', 'spill')
+
+    def __init__(self, maxsize=8, policy='block', latency=None):
+        super(ResultWriter, self).__init__(name='result-writer', daemon=True)
+        assert policy in self.POLICIES, f'policy must be one of {self.POLICIES}'
+        self.queue = StageQueue('writer', maxsize)
+        self.policy = policy
+        self.error = None               # last encoding error, reported by the owner
+        self.frames = 0                 # frames encoded
+        self.dropped = 0                # frames discarded by the 'drop' policy
+        self.spills = 0                 # frames that went through the overflow, also names the .npy files
+        self.spilled = deque()          # [path, im or None, npy file or None, fps, size, key], oldest first
+        self.in_memory = 0              # overflow frames not yet on disk
+        self.spill_dir = None
+        self.spiller = None
+        self.closing = False
+        self.lock = threading.Condition()
+        self.writers = {}               # stream key -> (save path, cv2.VideoWriter)
+        self.latency = latency          # LatencyHistogram of the encode time per frame, optional
+
+    # fps/size given: append to the video at `path` of stream `key`, otherwise save a single image
+    def write(self, path, im, fps=None, size=None, key=0):
+        item = (path, im, fps, size, key)
+        if self.policy == 'block':
+            self.queue.put(item)
+            return
+        with self.lock:
+            if not self.spilled:        # once spilling, keep spilling until drained to preserve order
+                try:
+                    self.queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    pass
+            if self.policy == 'drop':
+                self.dropped += 1
+                return
+            if self.spiller is None:
+                self.spill_dir = tempfile.mkdtemp(prefix='yolo-spill-')
+                self.spiller = threading.Thread(target=self.spill, name='result-spiller', daemon=True)
+                self.spiller.start()
+            while self.in_memory >= self.queue.maxsize:     # spill thread is behind, throttle
+                self.lock.wait()
+            self.spilled.append([path, im, None, fps, size, key])
+            self.in_memory += 1
+            self.spills += 1
+            self.lock.notify_all()
+
+    # Spill thread: move the newest overflow frame still in memory to disk, the oldest are
+    # the next ones the encoder takes back and may not need a round trip at all
+    def spill(self):
+        while True:
+            with self.lock:
+                entry = next((e for e in reversed(self.spilled) if e[1] is not None), None)
+                while entry is None:
+                    if self.closing:
+                        return
+                    self.lock.wait(0.1)
+                    entry = next((e for e in reversed(self.spilled) if e[1] is not None), None)
+                im = entry[1]
+            file = os.path.join(self.spill_dir, f'{id(entry)}.npy')
+            try:
+                np.save(file, im)
+            except Exception as e:  # disk full etc., keep the frame in memory and retry
+                self.error = e
+                with self.lock:
+                    self.lock.wait(1.0)
+                continue
+            with self.lock:
+                if entry[1] is None:    # the encoder took it from memory meanwhile
+                    os.remove(file)
+                    continue
+                entry[1], entry[2] = None, file
+                self.in_memory -= 1
+                self.lock.notify_all()
+
+    def unspill(self):
+        with self.lock:
+            if not self.spilled:
+                return None
+            entry = self.spilled.popleft()
+            path, im, file, fps, size, key = entry
+            if im is not None:
+                entry[1] = None
+                self.in_memory -= 1
+                self.lock.notify_all()
+        if im is None:
+            im = np.load(file)
+            os.remove(file)
+        return path, im, fps, size, key
+
+    def run(self):
+        while True:
+            item = self.unspill() if self.queue.empty() else None
+            if item is None:
+                try:
+                    item = self.queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            if item is STOP:
+                while True:
+                    item = self.unspill()
+                    if item is None:
+                        break
+                    self.encode(item)
+                break
+            self.encode(item)
+        for _, writer in self.writers.values():
+            writer.release()    # release final video writer
+        self.writers = {}
+        if self.spiller is not None:
+            with self.lock:
+                self.closing = True
+            self.spiller.join()
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def encode(self, item):
+        path, im, fps, size, key = item
+        t = time.perf_counter()
+        try:
+            if fps is None:
+                cv2.imwrite(path, im)
+            else:
+                current = self.writers.get(key)
+                if current is None or current[0] != path:   # new video
+                    if current is not None:
+                        current[1].release()    # release previous video writer
+                    self.writers[key] = (path, cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size))
+                self.writers[key][1].write(im)
+            self.frames += 1
+        except Exception as e:
+            self.error = e
+        if self.latency is not None:
+            self.latency.record((time.perf_counter() - t) * 1E3)
+
+    # Encode everything still queued or spilled, then release the video writers
+    def close(self):
+        self.queue.put(STOP)
+        self.join()
+
+
+# Crop export pool for save_crop: the render stage submits the untouched source frame and the
+# frame's boxes once, the pool threads cut, encode and write the crops, frames in parallel.
+# At most `maxsize` frames are in flight so memory stays bounded when the disk falls behind.
+class CropSaver:
+    def __init__(self, workers=2, maxsize=32):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crop-saver')
+        self.slots = threading.BoundedSemaphore(maxsize)
+        self.maxsize = maxsize
+        self.pending = 0                # frames submitted but not written yet
+        self.error = None               # last error, reported by the owner
+        self.lock = threading.Lock()
+
+    # im: BGR frame (not copied, must not be drawn on afterwards), boxes: (n, 4) xyxy, classes: (n,)
+    def submit(self, im, boxes, classes, names, save_dir, stem):
+        self.slots.acquire()
+        with self.lock:
+            self.pending += 1
+        future = self.pool.submit(self.save, im, boxes, classes, names, save_dir, stem)
+        future.add_done_callback(self.done)
+
+    def save(self, im, boxes, classes, names, save_dir, stem):
+        for box, c in zip(boxes, classes):
+            save_one_box(torch.from_numpy(box), im, file=save_dir / 'crops' / names[int(c)] / f'{stem}.jpg', BGR=True)
+
+    def done(self, future):
+        if future.exception() is not None:
+            self.error = future.exception()
+        with self.lock:
+            self.pending -= 1
+        self.slots.release()
+
+    def close(self):
+        self.pool.shutdown(wait=True)